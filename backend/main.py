@@ -1,8 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import secrets
 import time
 import os
 
@@ -12,8 +16,31 @@ from routes.event import router as event_router
 from routes.chatbot import router as chatbot_router
 from routes.analytics import router as analytics_router
 from routes.users import router as users_router
-from utils.supabase_client import ensure_seed_policies
-from utils.settings import FRONTEND_ORIGIN
+from utils.http_client import http_client
+from utils.redis_client import redis_client
+from utils.supabase_client import close_pool, ensure_seed_policies, get_supabase_service
+from utils.settings import FRONTEND_ORIGIN, METRICS_TOKEN
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build shared clients once per process and release them on shutdown.
+    """
+    logger.info("Starting ReBin Pro API")
+    try:
+        app.state.supabase = get_supabase_service()
+    except RuntimeError as exc:
+        logger.error(f"Supabase service unavailable: {exc}")
+        app.state.supabase = None
+    await ensure_seed_policies()
+    yield
+    if app.state.supabase is not None:
+        await app.state.supabase.close()
+    await http_client.aclose()
+    await close_pool()
+    if redis_client is not None:
+        await redis_client.aclose()
 
 
 def create_app() -> FastAPI:
@@ -25,7 +52,8 @@ def create_app() -> FastAPI:
         version="1.0.0",
         description="AI-Powered Waste Sorting API",
         docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
-        redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None
+        redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None,
+        lifespan=lifespan,
     )
 
     # Security middleware
@@ -41,6 +69,8 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE"],
         allow_headers=["*"],
+        # Cross-origin clients need this to page through /users/activity
+        expose_headers=["X-Next-Cursor"],
     )
 
     # Health check endpoint
@@ -56,6 +86,17 @@ def create_app() -> FastAPI:
             }
         )
 
+    # Prometheus scrape endpoint (per worker process), only for holders of METRICS_TOKEN
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        """Prometheus metrics, including Supabase query latency histograms."""
+        if not METRICS_TOKEN:
+            raise HTTPException(status_code=404, detail="Not Found")
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"})
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
     # Root endpoint
     @app.get("/")
     async def root():
@@ -77,11 +118,6 @@ def create_app() -> FastAPI:
     app.include_router(analytics_router, prefix="/analytics", tags=["analytics"])
     app.include_router(users_router, prefix="/users", tags=["users"])
 
-    @app.on_event("startup")
-    async def startup_event() -> None:
-        logger.info("Starting ReBin Pro API")
-        await ensure_seed_policies()
-
     return app
 
 
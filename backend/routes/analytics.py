@@ -5,11 +5,12 @@ Provides comprehensive analytics and insights
 
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
+from ciso8601 import parse_datetime
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, Field
 from loguru import logger
 
-from utils.supabase_client import get_supabase_service
+from utils.supabase_client import SupabaseService, provide_supabase_service
 from utils.settings import get_current_user_id  # We'll implement this
 
 router = APIRouter()
@@ -22,6 +23,14 @@ class AnalyticsRequest(BaseModel):
     user_id: Optional[str] = Field(default=None, description="Filter by user ID")
 
 
+class TrackEventRequest(BaseModel):
+    """Request model for tracking an analytics event"""
+    event_type: str
+    event_data: Dict[str, Any] = Field(default_factory=dict)
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+
 class AnalyticsResponse(BaseModel):
     """Response model for analytics data"""
     period: str
@@ -61,11 +70,11 @@ class TrendData(BaseModel):
 async def get_analytics_trends(
     time_period: str = Query(default="7d", description="Time period: 1d, 7d, 30d, 90d, 1y"),
     zip_code: Optional[str] = Query(default=None, description="Filter by ZIP code"),
-    user_id: Optional[str] = Query(default=None, description="Filter by user ID")
+    user_id: Optional[str] = Query(default=None, description="Filter by user ID"),
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> AnalyticsResponse:
     """Get recycling trends and patterns"""
     try:
-        service = get_supabase_service()
         
         # Calculate date range
         days = {
@@ -75,16 +84,13 @@ async def get_analytics_trends(
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Build query filters
-        query = service.client.table('sort_events').select('*')
-        if zip_code:
-            query = query.eq('zip', zip_code)
-        if user_id:
-            query = query.eq('user_id', user_id)
-        
         # Get sort events for the period
-        result = query.gte('created_at', start_date.isoformat()).execute()
-        events = result.data or []
+        events = await service.get_sort_events_in_range(
+            'user_id, zip, items_json, decision, co2e_saved, created_at',
+            start_date,
+            user_id=user_id,
+            zip_code=zip_code,
+        )
         
         # Calculate metrics
         total_items = len(events)
@@ -129,17 +135,16 @@ async def get_analytics_trends(
 @router.get("/impact", response_model=ImpactResponse)
 async def get_environmental_impact(
     user_id: Optional[str] = Query(default=None, description="User ID for personal impact"),
-    days: int = Query(default=30, description="Number of days to analyze")
+    days: int = Query(default=30, description="Number of days to analyze"),
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> ImpactResponse:
     """Calculate environmental impact metrics"""
     try:
-        service = get_supabase_service()
         
         if user_id:
             # Get user-specific data
             start_date = datetime.utcnow() - timedelta(days=days)
-            result = service.client.table('sort_events').select('*').eq('user_id', user_id).gte('created_at', start_date.isoformat()).execute()
-            events = result.data or []
+            events = await service.get_sort_events_in_range('decision, co2e_saved', start_date, user_id=user_id)
             
             # Calculate user metrics
             total_co2_saved = sum(event.get('co2e_saved', 0) for event in events)
@@ -165,8 +170,7 @@ async def get_environmental_impact(
         else:
             # Get global data
             start_date = datetime.utcnow() - timedelta(days=days)
-            result = service.client.table('sort_events').select('*').gte('created_at', start_date.isoformat()).execute()
-            events = result.data or []
+            events = await service.get_sort_events_in_range('decision, co2e_saved', start_date)
             
             total_co2_saved = sum(event.get('co2e_saved', 0) for event in events)
             total_items_sorted = len(events)
@@ -211,11 +215,11 @@ async def get_environmental_impact(
 @router.get("/leaderboard")
 async def get_leaderboard(
     limit: int = Query(default=50, description="Number of users to return"),
-    time_period: str = Query(default="all", description="Time period: 1d, 7d, 30d, all")
+    time_period: str = Query(default="all", description="Time period: 1d, 7d, 30d, all"),
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> List[Dict[str, Any]]:
     """Get leaderboard data"""
     try:
-        service = get_supabase_service()
         
         if time_period == "all":
             leaderboard = await service.get_leaderboard(limit)
@@ -225,8 +229,7 @@ async def get_leaderboard(
             start_date = datetime.utcnow() - timedelta(days=days)
             
             # Get recent events and calculate rankings
-            result = service.client.table('sort_events').select('*').gte('created_at', start_date.isoformat()).execute()
-            events = result.data or []
+            events = await service.get_sort_events_in_range('user_id, decision, co2e_saved', start_date)
             
             # Calculate user stats for the period
             user_stats = {}
@@ -262,12 +265,14 @@ async def get_leaderboard(
             for i, user in enumerate(leaderboard):
                 user['rank_position'] = i + 1
         
-        # Get user details for leaderboard
+        # Get user details for leaderboard in one batched query
+        user_ids = [entry['user_id'] for entry in leaderboard if entry.get('user_id')]
+        users = {user['id']: user for user in await service.get_users(user_ids)} if user_ids else {}
         enriched_leaderboard = []
         for entry in leaderboard:
             user_id = entry.get('user_id')
             if user_id:
-                user = await service.get_user(user_id)
+                user = users.get(user_id)
                 if user:
                     entry['user_name'] = user.get('full_name', 'Anonymous')
                     entry['avatar_url'] = user.get('avatar_url')
@@ -286,11 +291,11 @@ async def get_leaderboard(
 
 @router.get("/recent-activity")
 async def get_recent_activity(
-    limit: int = Query(default=20, description="Number of recent activities to return")
+    limit: int = Query(default=20, description="Number of recent activities to return"),
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> List[Dict[str, Any]]:
     """Get recent sorting activity"""
     try:
-        service = get_supabase_service()
         activities = await service.get_recent_activity(limit)
         return activities
         
@@ -301,15 +306,12 @@ async def get_recent_activity(
 
 @router.post("/track-event")
 async def track_analytics_event(
-    event_type: str,
-    event_data: Dict[str, Any],
-    user_id: Optional[str] = None,
-    session_id: Optional[str] = None
+    event: TrackEventRequest,
+    service: SupabaseService = Depends(provide_supabase_service)
 ):
     """Track an analytics event"""
     try:
-        service = get_supabase_service()
-        await service.track_event(user_id, event_type, event_data, session_id)
+        await service.track_event(event.user_id, event.event_type, event.event_data, event.session_id)
         return {"status": "success", "message": "Event tracked successfully"}
         
     except Exception as e:
@@ -328,8 +330,7 @@ async def _analyze_trends(service, events: List[Dict], days: int) -> Dict[str, A
     previous_start = datetime.utcnow() - timedelta(days=days * 2)
     previous_end = datetime.utcnow() - timedelta(days=days)
     
-    previous_events = service.client.table('sort_events').select('*').gte('created_at', previous_start.isoformat()).lt('created_at', previous_end.isoformat()).execute()
-    previous_data = previous_events.data or []
+    previous_data = await service.get_sort_events_in_range('co2e_saved', previous_start, previous_end)
     
     current_total = len(events)
     previous_total = len(previous_data)
@@ -400,7 +401,7 @@ async def _get_time_series_data(events: List[Dict], days: int) -> List[Dict[str,
         if created_at:
             # Parse date and get day
             try:
-                event_date = datetime.fromisoformat(created_at.replace('Z', '+00:00')).date()
+                event_date = parse_datetime(created_at).date()
                 day_key = event_date.isoformat()
                 
                 daily_counts[day_key] = daily_counts.get(day_key, 0) + 1
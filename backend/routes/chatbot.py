@@ -3,6 +3,7 @@ import random
 import re
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 from loguru import logger
 
@@ -19,8 +20,9 @@ from schemas import (
 )
 from utils.elevenlabs_client import (
     get_tts_base64,
+    iter_tts,
     get_voice_personalities,
-    get_avatar_configurations
+    get_avatar_configurations as list_avatar_configurations
 )
 
 security = HTTPBearer(auto_error=False)
@@ -270,6 +272,38 @@ async def simple_tts(request: dict):
         raise HTTPException(status_code=500, detail="Failed to generate speech")
 
 
+@router.post("/tts/stream")
+async def stream_tts(request: dict):
+    """
+    Stream TTS audio (audio/mpeg) as ElevenLabs produces it, for the avatar system.
+    """
+    text = sanitize_text(request.get("text", ""))
+    voice_personality = request.get("voice_personality", "friendly")
+
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided")
+
+    valid_personalities = ["friendly", "enthusiastic", "educational"]
+    if voice_personality not in valid_personalities:
+        logger.warning(f"Invalid voice personality '{voice_personality}', using 'friendly'")
+        voice_personality = "friendly"
+
+    # Pull the first chunk before responding so upstream failures still map to an HTTP error
+    chunks = iter_tts(text, voice_personality)
+    try:
+        first_chunk = await anext(chunks, b"")
+    except Exception as exc:
+        logger.error(f"TTS stream error: {exc}")
+        raise HTTPException(status_code=502, detail="Failed to generate speech")
+
+    async def audio():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+
 @router.get("/avatars", response_model=AvatarResponse)
 async def get_avatar_configurations():
     """
@@ -279,7 +313,7 @@ async def get_avatar_configurations():
         AvatarResponse: List of avatar configurations with voice personality mappings
     """
     try:
-        avatar_configs = get_avatar_configurations()
+        avatar_configs = list_avatar_configurations()
         avatars = []
         
         for config in avatar_configs:
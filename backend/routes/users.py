@@ -3,17 +3,23 @@ User management API routes for ReBin Pro
 Handles user profiles, preferences, achievements, and challenges
 """
 
+from types import MappingProxyType
 from typing import Dict, List, Optional, Any
-from fastapi import APIRouter, HTTPException, Depends, Query
-from pydantic import BaseModel, Field, EmailStr
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from pydantic import AliasChoices, BaseModel, ConfigDict, EmailStr, Field, TypeAdapter
 from loguru import logger
 
-from utils.supabase_client import get_supabase_service
+from utils.supabase_client import SupabaseService, provide_supabase_service
 
 router = APIRouter()
 
 
-class UserProfile(BaseModel):
+class _RowModel(BaseModel):
+    """Base for response models validated directly from Supabase rows"""
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
+
+class UserProfile(_RowModel):
     """User profile model"""
     id: str
     email: str
@@ -24,7 +30,7 @@ class UserProfile(BaseModel):
     is_active: bool = True
 
 
-class UserPreferences(BaseModel):
+class UserPreferences(_RowModel):
     """User preferences model"""
     theme: str = Field(default="light", description="UI theme: light, dark, auto")
     notifications_enabled: bool = Field(default=True)
@@ -38,7 +44,11 @@ class UserPreferences(BaseModel):
     privacy_level: str = Field(default="standard", description="minimal, standard, enhanced")
 
 
-class UserStats(BaseModel):
+# Read-only defaults served to users who have not saved preferences yet
+_DEFAULT_PREFERENCES = MappingProxyType(UserPreferences().model_dump())
+
+
+class UserStats(_RowModel):
     """User statistics model"""
     total_items_sorted: int
     total_co2_saved: float
@@ -48,64 +58,67 @@ class UserStats(BaseModel):
     achievement_count: int
 
 
-class Achievement(BaseModel):
+class Achievement(_RowModel):
     """Achievement model"""
     id: int
     achievement_type: str
-    achievement_data: Dict[str, Any]
-    points: int
+    achievement_data: Dict[str, Any] = Field(default_factory=dict)
+    points: int = 0
     earned_at: str
 
 
-class Challenge(BaseModel):
+class Challenge(_RowModel):
     """Challenge model"""
     id: int
     title: str
-    description: Optional[str]
+    description: Optional[str] = None
     challenge_type: str
-    target_items: Optional[int]
-    target_co2: Optional[float]
-    target_participants: Optional[int]
-    start_date: Optional[str]
-    end_date: Optional[str]
-    is_active: bool
-    is_featured: bool
-    difficulty_level: str
-    reward_points: int
+    target_items: Optional[int] = None
+    target_co2: Optional[float] = None
+    target_participants: Optional[int] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    is_active: bool = True
+    is_featured: bool = False
+    difficulty_level: str = "medium"
+    reward_points: int = 0
     created_at: str
 
 
-class ChallengeParticipation(BaseModel):
+class ChallengeParticipation(_RowModel):
     """Challenge participation model"""
     id: int
     challenge_id: int
     user_id: str
     joined_at: str
-    completed_at: Optional[str]
-    progress_data: Dict[str, Any]
-    points_earned: int
-    challenge: Optional[Challenge] = None
+    completed_at: Optional[str] = None
+    progress_data: Dict[str, Any] = Field(default_factory=dict)
+    points_earned: int = 0
+    # PostgREST embeds the joined row under the table name
+    challenge: Optional[Challenge] = Field(
+        default=None, validation_alias=AliasChoices("challenges", "challenge")
+    )
+
+
+# List validators run in pydantic-core in a single call per response
+_ACHIEVEMENT_LIST = TypeAdapter(List[Achievement])
+_CHALLENGE_LIST = TypeAdapter(List[Challenge])
+_PARTICIPATION_LIST = TypeAdapter(List[ChallengeParticipation])
 
 
 @router.get("/profile/{user_id}", response_model=UserProfile)
-async def get_user_profile(user_id: str) -> UserProfile:
+async def get_user_profile(
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> UserProfile:
     """Get user profile by ID"""
     try:
-        service = get_supabase_service()
         user = await service.get_user(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return UserProfile(
-            id=user['id'],
-            email=user['email'],
-            full_name=user.get('full_name'),
-            avatar_url=user.get('avatar_url'),
-            created_at=user['created_at'],
-            last_seen=user.get('last_seen'),
-            is_active=user.get('is_active', True)
-        )
+        return UserProfile.model_validate(user)
         
     except HTTPException:
         raise
@@ -115,26 +128,20 @@ async def get_user_profile(user_id: str) -> UserProfile:
 
 
 @router.put("/profile/{user_id}", response_model=UserProfile)
-async def update_user_profile(user_id: str, profile_data: Dict[str, Any]) -> UserProfile:
+async def update_user_profile(
+    user_id: str,
+    profile_data: Dict[str, Any],
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> UserProfile:
     """Update user profile"""
     try:
-        service = get_supabase_service()
-        
         # Update user data
         updated_user = await service.update_user(user_id, profile_data)
         
         if not updated_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return UserProfile(
-            id=updated_user['id'],
-            email=updated_user['email'],
-            full_name=updated_user.get('full_name'),
-            avatar_url=updated_user.get('avatar_url'),
-            created_at=updated_user['created_at'],
-            last_seen=updated_user.get('last_seen'),
-            is_active=updated_user.get('is_active', True)
-        )
+        return UserProfile.model_validate(updated_user)
         
     except HTTPException:
         raise
@@ -144,28 +151,19 @@ async def update_user_profile(user_id: str, profile_data: Dict[str, Any]) -> Use
 
 
 @router.get("/preferences/{user_id}", response_model=UserPreferences)
-async def get_user_preferences(user_id: str) -> UserPreferences:
+async def get_user_preferences(
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> UserPreferences:
     """Get user preferences"""
     try:
-        service = get_supabase_service()
         preferences = await service.get_user_preferences(user_id)
         
         if not preferences:
             # Return default preferences if none exist
-            return UserPreferences()
+            return _DEFAULT_PREFERENCES
         
-        return UserPreferences(
-            theme=preferences.get('theme', 'light'),
-            notifications_enabled=preferences.get('notifications_enabled', True),
-            email_notifications=preferences.get('email_notifications', True),
-            push_notifications=preferences.get('push_notifications', True),
-            default_zip=preferences.get('default_zip'),
-            avatar_preference=preferences.get('avatar_preference', 'eco-emma'),
-            language=preferences.get('language', 'en'),
-            timezone=preferences.get('timezone', 'UTC'),
-            units=preferences.get('units', 'metric'),
-            privacy_level=preferences.get('privacy_level', 'standard')
-        )
+        return UserPreferences.model_validate(preferences)
         
     except Exception as e:
         logger.error(f"Failed to get user preferences {user_id}: {e}")
@@ -173,29 +171,20 @@ async def get_user_preferences(user_id: str) -> UserPreferences:
 
 
 @router.put("/preferences/{user_id}", response_model=UserPreferences)
-async def update_user_preferences(user_id: str, preferences: UserPreferences) -> UserPreferences:
+async def update_user_preferences(
+    user_id: str,
+    preferences: UserPreferences,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> UserPreferences:
     """Update user preferences"""
     try:
-        service = get_supabase_service()
-        
-        preferences_dict = preferences.dict()
+        preferences_dict = preferences.model_dump()
         updated_preferences = await service.update_user_preferences(user_id, preferences_dict)
         
         if not updated_preferences:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return UserPreferences(
-            theme=updated_preferences.get('theme', 'light'),
-            notifications_enabled=updated_preferences.get('notifications_enabled', True),
-            email_notifications=updated_preferences.get('email_notifications', True),
-            push_notifications=updated_preferences.get('push_notifications', True),
-            default_zip=updated_preferences.get('default_zip'),
-            avatar_preference=updated_preferences.get('avatar_preference', 'eco-emma'),
-            language=updated_preferences.get('language', 'en'),
-            timezone=updated_preferences.get('timezone', 'UTC'),
-            units=updated_preferences.get('units', 'metric'),
-            privacy_level=updated_preferences.get('privacy_level', 'standard')
-        )
+        return UserPreferences.model_validate(updated_preferences)
         
     except HTTPException:
         raise
@@ -205,15 +194,16 @@ async def update_user_preferences(user_id: str, preferences: UserPreferences) ->
 
 
 @router.get("/stats/{user_id}", response_model=UserStats)
-async def get_user_stats(user_id: str) -> UserStats:
+async def get_user_stats(
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> UserStats:
     """Get user statistics and leaderboard position"""
     try:
-        service = get_supabase_service()
+        # Rank fields and achievement count come back from a single RPC
+        stats = await service.get_user_stats(user_id)
         
-        # Get user rank data
-        rank_data = await service.get_user_rank(user_id)
-        
-        if not rank_data:
+        if not stats:
             # Return default stats if user has no activity
             return UserStats(
                 total_items_sorted=0,
@@ -224,16 +214,13 @@ async def get_user_stats(user_id: str) -> UserStats:
                 achievement_count=0
             )
         
-        # Get achievement count
-        achievements = await service.get_user_achievements(user_id)
-        
         return UserStats(
-            total_items_sorted=rank_data.get('total_items_sorted', 0),
-            total_co2_saved=rank_data.get('total_co2_saved', 0.0),
-            total_points=rank_data.get('total_points', 0),
-            rank_position=rank_data.get('rank_position'),
-            streak_days=rank_data.get('streak_days', 0),
-            achievement_count=len(achievements)
+            total_items_sorted=stats.get('total_items_sorted') or 0,
+            total_co2_saved=stats.get('total_co2_saved') or 0.0,
+            total_points=stats.get('total_points') or 0,
+            rank_position=stats.get('rank_position'),
+            streak_days=stats.get('streak_days') or 0,
+            achievement_count=stats.get('achievement_count') or 0
         )
         
     except Exception as e:
@@ -242,22 +229,15 @@ async def get_user_stats(user_id: str) -> UserStats:
 
 
 @router.get("/achievements/{user_id}", response_model=List[Achievement])
-async def get_user_achievements(user_id: str) -> List[Achievement]:
+async def get_user_achievements(
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> List[Achievement]:
     """Get user achievements"""
     try:
-        service = get_supabase_service()
         achievements = await service.get_user_achievements(user_id)
         
-        return [
-            Achievement(
-                id=achievement['id'],
-                achievement_type=achievement['achievement_type'],
-                achievement_data=achievement.get('achievement_data', {}),
-                points=achievement.get('points', 0),
-                earned_at=achievement['earned_at']
-            )
-            for achievement in achievements
-        ]
+        return _ACHIEVEMENT_LIST.validate_python(achievements)
         
     except Exception as e:
         logger.error(f"Failed to get user achievements {user_id}: {e}")
@@ -266,36 +246,17 @@ async def get_user_achievements(user_id: str) -> List[Achievement]:
 
 @router.get("/challenges", response_model=List[Challenge])
 async def get_active_challenges(
-    featured_only: bool = Query(default=False, description="Get only featured challenges")
+    featured_only: bool = Query(default=False, description="Get only featured challenges"),
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> List[Challenge]:
     """Get active challenges"""
     try:
-        service = get_supabase_service()
-        
         if featured_only:
             challenges = await service.get_featured_challenges()
         else:
             challenges = await service.get_active_challenges()
         
-        return [
-            Challenge(
-                id=challenge['id'],
-                title=challenge['title'],
-                description=challenge.get('description'),
-                challenge_type=challenge['challenge_type'],
-                target_items=challenge.get('target_items'),
-                target_co2=challenge.get('target_co2'),
-                target_participants=challenge.get('target_participants'),
-                start_date=challenge.get('start_date'),
-                end_date=challenge.get('end_date'),
-                is_active=challenge.get('is_active', True),
-                is_featured=challenge.get('is_featured', False),
-                difficulty_level=challenge.get('difficulty_level', 'medium'),
-                reward_points=challenge.get('reward_points', 0),
-                created_at=challenge['created_at']
-            )
-            for challenge in challenges
-        ]
+        return _CHALLENGE_LIST.validate_python(challenges)
         
     except Exception as e:
         logger.error(f"Failed to get challenges: {e}")
@@ -303,10 +264,13 @@ async def get_active_challenges(
 
 
 @router.post("/challenges/{challenge_id}/join")
-async def join_challenge(challenge_id: int, user_id: str) -> Dict[str, Any]:
+async def join_challenge(
+    challenge_id: int,
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> Dict[str, Any]:
     """Join a challenge"""
     try:
-        service = get_supabase_service()
         success = await service.join_challenge(user_id, challenge_id)
         
         if not success:
@@ -322,40 +286,15 @@ async def join_challenge(challenge_id: int, user_id: str) -> Dict[str, Any]:
 
 
 @router.get("/challenges/{user_id}/participating", response_model=List[ChallengeParticipation])
-async def get_user_challenges(user_id: str) -> List[ChallengeParticipation]:
+async def get_user_challenges(
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> List[ChallengeParticipation]:
     """Get challenges user is participating in"""
     try:
-        service = get_supabase_service()
         user_challenges = await service.get_user_challenges(user_id)
         
-        return [
-            ChallengeParticipation(
-                id=participation['id'],
-                challenge_id=participation['challenge_id'],
-                user_id=participation['user_id'],
-                joined_at=participation['joined_at'],
-                completed_at=participation.get('completed_at'),
-                progress_data=participation.get('progress_data', {}),
-                points_earned=participation.get('points_earned', 0),
-                challenge=Challenge(
-                    id=participation['challenges']['id'],
-                    title=participation['challenges']['title'],
-                    description=participation['challenges'].get('description'),
-                    challenge_type=participation['challenges']['challenge_type'],
-                    target_items=participation['challenges'].get('target_items'),
-                    target_co2=participation['challenges'].get('target_co2'),
-                    target_participants=participation['challenges'].get('target_participants'),
-                    start_date=participation['challenges'].get('start_date'),
-                    end_date=participation['challenges'].get('end_date'),
-                    is_active=participation['challenges'].get('is_active', True),
-                    is_featured=participation['challenges'].get('is_featured', False),
-                    difficulty_level=participation['challenges'].get('difficulty_level', 'medium'),
-                    reward_points=participation['challenges'].get('reward_points', 0),
-                    created_at=participation['challenges']['created_at']
-                ) if participation.get('challenges') else None
-            )
-            for participation in user_challenges
-        ]
+        return _PARTICIPATION_LIST.validate_python(user_challenges)
         
     except Exception as e:
         logger.error(f"Failed to get user challenges {user_id}: {e}")
@@ -365,15 +304,22 @@ async def get_user_challenges(user_id: str) -> List[ChallengeParticipation]:
 @router.get("/activity/{user_id}")
 async def get_user_activity(
     user_id: str,
+    response: Response,
     limit: int = Query(default=50, description="Number of activities to return"),
-    offset: int = Query(default=0, description="Offset for pagination")
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor value from the previous page"),
+    full: bool = Query(default=False, description="Include the detected items of each event"),
+    offset: int = Query(default=0, deprecated=True, description="Offset for pagination; use cursor instead"),
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> List[Dict[str, Any]]:
-    """Get user's sorting activity"""
+    """Get user's sorting activity; the next page's cursor is returned in the X-Next-Cursor header"""
     try:
-        service = get_supabase_service()
-        activities = await service.get_user_sort_events(user_id, limit, offset)
-        return activities
+        page = await service.get_user_sort_events(user_id, limit, cursor, full, offset=offset)
+        if page['next_cursor']:
+            response.headers['X-Next-Cursor'] = page['next_cursor']
+        return page['data']
         
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         logger.error(f"Failed to get user activity {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve user activity")
@@ -385,11 +331,11 @@ async def submit_feedback(
     sort_event_id: Optional[int] = None,
     feedback_type: str = "suggestion",
     rating: Optional[int] = None,
-    comment: Optional[str] = None
+    comment: Optional[str] = None,
+    service: SupabaseService = Depends(provide_supabase_service)
 ) -> Dict[str, Any]:
     """Submit user feedback"""
     try:
-        service = get_supabase_service()
         success = await service.submit_feedback(user_id, sort_event_id, feedback_type, rating, comment)
         
         if not success:
@@ -405,10 +351,12 @@ async def submit_feedback(
 
 
 @router.post("/last-seen/{user_id}")
-async def update_last_seen(user_id: str) -> Dict[str, Any]:
+async def update_last_seen(
+    user_id: str,
+    service: SupabaseService = Depends(provide_supabase_service)
+) -> Dict[str, Any]:
     """Update user's last seen timestamp"""
     try:
-        service = get_supabase_service()
         await service.update_user_last_seen(user_id)
         return {"status": "success", "message": "Last seen updated"}
         
@@ -4,12 +4,12 @@ Test suite for analytics API endpoints
 
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 import json
 from datetime import datetime, timedelta
 
 from main import app
-from utils.supabase_client import get_supabase_service
+from utils.supabase_client import provide_supabase_service
 
 client = TestClient(app)
 
@@ -20,10 +20,10 @@ class TestAnalyticsAPI:
     @pytest.fixture
     def mock_supabase_service(self):
         """Mock Supabase service for testing"""
-        with patch('utils.supabase_client.get_supabase_service') as mock:
-            service = Mock()
-            mock.return_value = service
-            yield service
+        service = AsyncMock()
+        app.dependency_overrides[provide_supabase_service] = lambda: service
+        yield service
+        app.dependency_overrides.pop(provide_supabase_service, None)
     
     def test_get_analytics_trends_success(self, mock_supabase_service):
         """Test successful analytics trends retrieval"""
@@ -49,7 +49,7 @@ class TestAnalyticsAPI:
             }
         ]
         
-        mock_supabase_service.client.table.return_value.select.return_value.gte.return_value.execute.return_value.data = mock_events
+        mock_supabase_service.get_sort_events_in_range.return_value = mock_events
         
         response = client.get("/analytics/trends?time_period=7d")
         
@@ -57,7 +57,7 @@ class TestAnalyticsAPI:
         data = response.json()
         assert data['period'] == '7d'
         assert data['total_items'] == 2
-        assert data['total_co2_saved'] == 0.15
+        assert data['total_co2_saved'] == pytest.approx(0.15)
         assert data['total_users'] == 2
         assert data['recycling_rate'] == 50.0
     
@@ -75,13 +75,15 @@ class TestAnalyticsAPI:
             }
         ]
         
-        mock_supabase_service.client.table.return_value.select.return_value.eq.return_value.gte.return_value.execute.return_value.data = mock_events
+        mock_supabase_service.get_sort_events_in_range.return_value = mock_events
         
         response = client.get("/analytics/trends?time_period=7d&zip_code=10001&user_id=user1")
         
         assert response.status_code == 200
         data = response.json()
         assert data['total_items'] == 1
+        _, kwargs = mock_supabase_service.get_sort_events_in_range.call_args_list[0]
+        assert kwargs == {'user_id': 'user1', 'zip_code': '10001'}
     
     def test_get_environmental_impact_user_specific(self, mock_supabase_service):
         """Test environmental impact calculation for specific user"""
@@ -122,7 +124,7 @@ class TestAnalyticsAPI:
         }
         
         # Mock service calls
-        mock_supabase_service.client.table.return_value.select.return_value.eq.return_value.gte.return_value.execute.return_value.data = mock_events
+        mock_supabase_service.get_sort_events_in_range.return_value = mock_events
         mock_supabase_service.get_user_achievements.return_value = mock_achievements
         mock_supabase_service.get_user_rank.return_value = mock_rank_data
         
@@ -131,7 +133,7 @@ class TestAnalyticsAPI:
         assert response.status_code == 200
         data = response.json()
         assert data['user_id'] == 'user1'
-        assert data['total_co2_saved'] == 0.15
+        assert data['total_co2_saved'] == pytest.approx(0.15)
         assert data['total_items_sorted'] == 2
         assert data['recycling_percentage'] == 50.0
         assert data['compost_percentage'] == 50.0
@@ -163,11 +165,10 @@ class TestAnalyticsAPI:
         ]
         
         mock_supabase_service.get_leaderboard.return_value = mock_leaderboard
-        mock_supabase_service.get_user.return_value = {
-            'id': 'user1',
-            'full_name': 'John Doe',
-            'avatar_url': None
-        }
+        mock_supabase_service.get_users.return_value = [
+            {'id': 'user1', 'full_name': 'John Doe', 'avatar_url': None},
+            {'id': 'user2', 'full_name': 'Jane Smith', 'avatar_url': None},
+        ]
         
         response = client.get("/analytics/leaderboard?limit=10")
         
@@ -222,8 +223,10 @@ class TestAnalyticsAPI:
         assert data['status'] == 'success'
         mock_supabase_service.track_event.assert_called_once()
     
-    def test_analytics_trends_invalid_period(self):
+    def test_analytics_trends_invalid_period(self, mock_supabase_service):
         """Test analytics trends with invalid time period"""
+        mock_supabase_service.get_sort_events_in_range.return_value = []
+        
         response = client.get("/analytics/trends?time_period=invalid")
         
         # Should still work but use default period
@@ -231,7 +234,7 @@ class TestAnalyticsAPI:
     
     def test_environmental_impact_no_user_data(self, mock_supabase_service):
         """Test environmental impact when user has no data"""
-        mock_supabase_service.client.table.return_value.select.return_value.eq.return_value.gte.return_value.execute.return_value.data = []
+        mock_supabase_service.get_sort_events_in_range.return_value = []
         mock_supabase_service.get_user_achievements.return_value = []
         mock_supabase_service.get_user_rank.return_value = None
         
@@ -256,12 +259,10 @@ class TestAnalyticsAPI:
             }
         ]
         
-        mock_supabase_service.client.table.return_value.select.return_value.gte.return_value.execute.return_value.data = mock_events
-        mock_supabase_service.get_user.return_value = {
-            'id': 'user1',
-            'full_name': 'John Doe',
-            'avatar_url': None
-        }
+        mock_supabase_service.get_sort_events_in_range.return_value = mock_events
+        mock_supabase_service.get_users.return_value = [
+            {'id': 'user1', 'full_name': 'John Doe', 'avatar_url': None},
+        ]
         
         response = client.get("/analytics/leaderboard?time_period=7d&limit=10")
         
@@ -273,7 +274,7 @@ class TestAnalyticsAPI:
     def test_analytics_error_handling(self, mock_supabase_service):
         """Test error handling in analytics endpoints"""
         # Mock service to raise an exception
-        mock_supabase_service.client.table.side_effect = Exception("Database error")
+        mock_supabase_service.get_sort_events_in_range.side_effect = Exception("Database error")
         
         response = client.get("/analytics/trends")
         
@@ -315,13 +316,8 @@ class TestAnalyticsAPI:
             }
         ]
         
-        # Mock the service calls
-        def mock_execute():
-            result = Mock()
-            result.data = current_events
-            return result
-        
-        mock_supabase_service.client.table.return_value.select.return_value.gte.return_value.execute.side_effect = mock_execute
+        # Current period first, then the previous period for the comparison
+        mock_supabase_service.get_sort_events_in_range.side_effect = [current_events, previous_events]
         
         response = client.get("/analytics/trends?time_period=7d")
         
@@ -330,3 +326,5 @@ class TestAnalyticsAPI:
         assert 'trends' in data
         assert 'items_trend' in data['trends']
         assert 'co2_trend' in data['trends']
+        assert data['trends']['items_trend']['current'] == 2
+        assert data['trends']['items_trend']['previous'] == 1
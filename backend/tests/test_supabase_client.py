@@ -0,0 +1,114 @@
+"""
+Test suite for SupabaseService internals (shared cache, sort event batching)
+"""
+
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+
+from utils import supabase_client
+
+
+class FakeRedis:
+    """Minimal async Redis stand-in with per-key expiry against a controllable clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.store = {}
+
+    async def get(self, name):
+        value, expires_at = self.store.get(name, (None, None))
+        if expires_at is not None and self.now >= expires_at:
+            del self.store[name]
+            return None
+        return value
+
+    async def set(self, name, value, ex=None):
+        self.store[name] = (value, self.now + ex if ex is not None else None)
+
+
+class TestSharedCache:
+    """Test the Redis-backed leaderboard/rank cache"""
+
+    @pytest.fixture
+    def fake_redis(self):
+        redis = FakeRedis()
+        with patch.object(supabase_client, 'redis_client', redis):
+            yield redis
+
+    def test_round_trip(self, fake_redis):
+        """Test a cached value is read back under its own key"""
+        asyncio.run(supabase_client._shared_cache_set("rank", "user1", {"rank_position": 3}))
+
+        assert asyncio.run(supabase_client._shared_cache_get("rank", "user1")) == {"rank_position": 3}
+        assert "rank:user1" in fake_redis.store
+
+    def test_entries_expire_independently(self, fake_redis):
+        """Test a later write for another user does not extend an earlier entry's TTL"""
+        ttl = supabase_client._LEADERBOARD_CACHE_TTL
+        asyncio.run(supabase_client._shared_cache_set("rank", "user1", {"rank_position": 1}))
+
+        fake_redis.now = ttl - 1
+        asyncio.run(supabase_client._shared_cache_set("rank", "user2", {"rank_position": 2}))
+
+        fake_redis.now = ttl + 1
+        assert asyncio.run(supabase_client._shared_cache_get("rank", "user1")) is None
+        assert asyncio.run(supabase_client._shared_cache_get("rank", "user2")) == {"rank_position": 2}
+
+    def test_no_redis(self):
+        """Test the cache is a no-op when Redis is not configured"""
+        with patch.object(supabase_client, 'redis_client', None):
+            asyncio.run(supabase_client._shared_cache_set("leaderboard", "10", []))
+            assert asyncio.run(supabase_client._shared_cache_get("leaderboard", "10")) is None
+
+
+class TestSortEventBatching:
+    """Test the batched sort event writer"""
+
+    @pytest.fixture
+    def service(self):
+        with patch.object(supabase_client, 'supabase'):
+            service = supabase_client.SupabaseService()
+
+        next_id = iter(range(1, 1000))
+
+        def execute(builder):
+            rows = builder.rows
+            if any(row['user_id'] == 'missing-user' for row in rows):
+                raise Exception('insert or update on table "sort_events" violates foreign key constraint')
+            return Mock(data=[{'id': next(next_id)} for _ in rows])
+
+        def insert(rows):
+            builder = Mock()
+            builder.rows = rows
+            builder.execute = lambda: execute(builder)
+            return builder
+
+        service.client.table.return_value.insert.side_effect = insert
+        return service
+
+    def _write(self, service, user_ids):
+        async def run():
+            loop = asyncio.get_running_loop()
+            batch = [({'user_id': user_id}, loop.create_future()) for user_id in user_ids]
+            await service._write_sort_events(batch)
+            return [future.exception() or future.result() for _, future in batch]
+        return asyncio.run(run())
+
+    def test_batch_inserted_in_one_call(self, service):
+        """Test a clean batch is written with a single multi-row insert"""
+        results = self._write(service, ['user1', 'user2', 'user3'])
+
+        assert results == [1, 2, 3]
+        assert service.client.table.return_value.insert.call_count == 1
+
+    def test_bad_row_fails_only_its_own_request(self, service):
+        """Test one constraint violation does not fail the rest of the batch"""
+        results = self._write(service, ['user1', 'missing-user', 'user3'])
+
+        assert isinstance(results[1], Exception)
+        assert "foreign key" in str(results[1])
+        assert sorted(results[0::2]) == [1, 2]
+        # One failed batch insert, then one retry per row
+        assert service.client.table.return_value.insert.call_count == 4
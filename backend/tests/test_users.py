@@ -4,12 +4,12 @@ Test suite for user management API endpoints
 
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 import json
 from datetime import datetime
 
 from main import app
-from utils.supabase_client import get_supabase_service
+from utils.supabase_client import provide_supabase_service
 
 client = TestClient(app)
 
@@ -20,10 +20,10 @@ class TestUsersAPI:
     @pytest.fixture
     def mock_supabase_service(self):
         """Mock Supabase service for testing"""
-        with patch('utils.supabase_client.get_supabase_service') as mock:
-            service = Mock()
-            mock.return_value = service
-            yield service
+        service = AsyncMock()
+        app.dependency_overrides[provide_supabase_service] = lambda: service
+        yield service
+        app.dependency_overrides.pop(provide_supabase_service, None)
     
     def test_get_user_profile_success(self, mock_supabase_service):
         """Test successful user profile retrieval"""
@@ -164,32 +164,16 @@ class TestUsersAPI:
     
     def test_get_user_stats_success(self, mock_supabase_service):
         """Test successful user statistics retrieval"""
-        mock_rank_data = {
-            'user_id': 'user123',
+        mock_stats = {
             'total_items_sorted': 150,
             'total_co2_saved': 7.5,
             'total_points': 750,
             'rank_position': 5,
-            'streak_days': 12
+            'streak_days': 12,
+            'achievement_count': 2
         }
         
-        mock_achievements = [
-            {
-                'id': 1,
-                'achievement_type': 'first_sort',
-                'points': 10,
-                'earned_at': '2024-01-01T00:00:00Z'
-            },
-            {
-                'id': 2,
-                'achievement_type': 'sorting_novice',
-                'points': 50,
-                'earned_at': '2024-01-05T00:00:00Z'
-            }
-        ]
-        
-        mock_supabase_service.get_user_rank.return_value = mock_rank_data
-        mock_supabase_service.get_user_achievements.return_value = mock_achievements
+        mock_supabase_service.get_user_stats.return_value = mock_stats
         
         response = client.get("/users/stats/user123")
         
@@ -201,11 +185,12 @@ class TestUsersAPI:
         assert data['rank_position'] == 5
         assert data['streak_days'] == 12
         assert data['achievement_count'] == 2
+        mock_supabase_service.get_user_stats.assert_called_once_with('user123')
+        mock_supabase_service.get_user_achievements.assert_not_called()
     
     def test_get_user_stats_no_data(self, mock_supabase_service):
         """Test user statistics when user has no data"""
-        mock_supabase_service.get_user_rank.return_value = None
-        mock_supabase_service.get_user_achievements.return_value = []
+        mock_supabase_service.get_user_stats.return_value = None
         
         response = client.get("/users/stats/user123")
         
@@ -380,9 +365,9 @@ class TestUsersAPI:
             }
         ]
         
-        mock_supabase_service.get_user_sort_events.return_value = mock_activities
+        mock_supabase_service.get_user_sort_events.return_value = {'data': mock_activities, 'next_cursor': None}
         
-        response = client.get("/users/activity/user123?limit=50&offset=0")
+        response = client.get("/users/activity/user123?limit=50")
         
         assert response.status_code == 200
         data = response.json()
@@ -390,6 +375,29 @@ class TestUsersAPI:
         assert data[0]['user_id'] == 'user123'
         assert data[0]['decision'] == 'recycling'
     
+    def test_get_user_activity_next_cursor(self, mock_supabase_service):
+        """Test that the next page cursor is passed through as a header"""
+        mock_supabase_service.get_user_sort_events.return_value = {
+            'data': [{'id': 7, 'decision': 'compost', 'created_at': '2024-01-15T12:00:00Z'}],
+            'next_cursor': 'next-page'
+        }
+        
+        response = client.get("/users/activity/user123?limit=1&cursor=this-page")
+        
+        assert response.status_code == 200
+        assert response.headers['X-Next-Cursor'] == 'next-page'
+        mock_supabase_service.get_user_sort_events.assert_called_once_with('user123', 1, 'this-page', False, offset=0)
+    
+    def test_get_user_activity_offset_fallback(self, mock_supabase_service):
+        """Test that the deprecated offset parameter is still passed through"""
+        mock_supabase_service.get_user_sort_events.return_value = {'data': [], 'next_cursor': None}
+        
+        response = client.get("/users/activity/user123?limit=10&offset=20")
+        
+        assert response.status_code == 200
+        assert 'X-Next-Cursor' not in response.headers
+        mock_supabase_service.get_user_sort_events.assert_called_once_with('user123', 10, None, False, offset=20)
+    
     def test_submit_feedback_success(self, mock_supabase_service):
         """Test successful feedback submission"""
         feedback_data = {
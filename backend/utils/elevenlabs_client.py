@@ -1,17 +1,27 @@
-import base64
+import asyncio
+import contextlib
+import hashlib
+import os
 import tempfile
-from typing import Optional, Dict, Any, List
+import uuid
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import AsyncIterator, Optional, Dict, Any, List, Mapping, Tuple
 from pathlib import Path
 
+import aiofiles
+import orjson
+import pybase64
 from fastapi import HTTPException
 from loguru import logger
 
 from utils.http_client import http_client
-from utils.settings import ELEVENLABS_API_KEY
+from utils.redis_client import redis_client
+from utils.settings import ELEVENLABS_API_KEY, TTS_CACHE_BYTES, TTS_CACHE_TTL_SECONDS
 
 
 # Voice personality configurations with avatar metadata
-VOICE_PERSONALITIES = {
+_VOICE_PERSONALITY_CONFIGS = {
     "friendly": {
         "voice_id": "s3TPKV1kjDlVtZbl4Ksh",  # Default friendly voice
         "voice_settings": {
@@ -62,6 +72,119 @@ VOICE_PERSONALITIES = {
     }
 }
 
+# Read-only view handed to callers, so the shared configuration can be returned without copying
+VOICE_PERSONALITIES: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    pid: MappingProxyType({
+        **cfg,
+        "voice_settings": MappingProxyType(cfg["voice_settings"]),
+        "avatar": MappingProxyType({**cfg["avatar"], "personality_traits": tuple(cfg["avatar"]["personality_traits"])}),
+    })
+    for pid, cfg in _VOICE_PERSONALITY_CONFIGS.items()
+})
+
+
+_TTS_HEADERS: Dict[str, str] = {
+    "xi-api-key": ELEVENLABS_API_KEY,
+    "Content-Type": "application/json",
+}
+
+# Per-personality request pieces, built once so the TTS hot path only adds the text
+_TTS_URLS: Dict[str, str] = {
+    pid: f"https://api.elevenlabs.io/v1/text-to-speech/{cfg['voice_id']}"
+    for pid, cfg in VOICE_PERSONALITIES.items()
+}
+_TTS_BODY_TEMPLATES: Dict[str, Dict[str, Any]] = {
+    pid: {"model_id": "eleven_monolingual_v1", "voice_settings": dict(cfg["voice_settings"])}
+    for pid, cfg in VOICE_PERSONALITIES.items()
+}
+_TTS_KEY_SUFFIXES: Dict[str, bytes] = {
+    pid: b"\x00" + cfg["voice_id"].encode() + b"\x00" + orjson.dumps(dict(cfg["voice_settings"]), option=orjson.OPT_SORT_KEYS)
+    for pid, cfg in VOICE_PERSONALITIES.items()
+}
+
+_AVATAR_LIST: Tuple[Mapping[str, Any], ...] = tuple(
+    MappingProxyType({"personality_id": pid, "voice_id": cfg["voice_id"], "avatar": cfg["avatar"]})
+    for pid, cfg in VOICE_PERSONALITIES.items()
+)
+_AVATARS_BY_ID: Dict[str, Mapping[str, Any]] = {avatar["personality_id"]: avatar for avatar in _AVATAR_LIST}
+
+
+def _resolve_personality(voice_personality: str) -> str:
+    return voice_personality if voice_personality in VOICE_PERSONALITIES else "friendly"
+
+
+# LRU of synthesized MP3 bytes keyed by a digest of (text, voice, settings).
+# Reads and writes never await, so the event loop serializes them without a lock.
+_TTS_CACHE: "OrderedDict[bytes, bytes]" = OrderedDict()
+_tts_cache_bytes = 0
+
+
+def _tts_cache_key(text: str, personality_id: str) -> bytes:
+    """
+    Digest identifying the audio ElevenLabs would produce for this request.
+    """
+    return hashlib.blake2b(text.encode() + _TTS_KEY_SUFFIXES[personality_id], digest_size=16).digest()
+
+
+def _tts_cache_get(key: bytes) -> Optional[bytes]:
+    audio = _TTS_CACHE.get(key)
+    if audio is not None:
+        _TTS_CACHE.move_to_end(key)
+    return audio
+
+
+def _tts_cache_put(key: bytes, audio: bytes) -> None:
+    global _tts_cache_bytes
+    if len(audio) > TTS_CACHE_BYTES or key in _TTS_CACHE:
+        return
+    _TTS_CACHE[key] = audio
+    _tts_cache_bytes += len(audio)
+    while _tts_cache_bytes > TTS_CACHE_BYTES:
+        _, evicted = _TTS_CACHE.popitem(last=False)
+        _tts_cache_bytes -= len(evicted)
+
+
+async def _tts_shared_get(key: bytes) -> Optional[bytes]:
+    """
+    Look up audio in the cross-worker Redis cache, if one is configured.
+    """
+    if redis_client is None:
+        return None
+    try:
+        return await redis_client.get(b"tts:" + key)
+    except Exception as e:
+        logger.warning(f"TTS shared cache read failed: {e}")
+        return None
+
+
+async def _tts_shared_put(key: bytes, audio: bytes) -> None:
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(b"tts:" + key, TTS_CACHE_TTL_SECONDS, audio)
+    except Exception as e:
+        logger.warning(f"TTS shared cache write failed: {e}")
+
+
+async def _tts_cached(key: bytes) -> Optional[bytes]:
+    """
+    Return cached audio from the in-process LRU, falling back to Redis.
+    """
+    cached = _tts_cache_get(key)
+    if cached is not None:
+        return cached
+    cached = await _tts_shared_get(key)
+    if cached is not None:
+        _tts_cache_put(key, cached)
+    return cached
+
+
+def _tts_body(text: str, personality_id: str) -> bytes:
+    """
+    Serialize the ElevenLabs text-to-speech request body for a personality.
+    """
+    return orjson.dumps({**_TTS_BODY_TEMPLATES[personality_id], "text": text})
+
 
 async def get_tts_audio_data(
     text: str, 
@@ -81,31 +204,25 @@ async def get_tts_audio_data(
         logger.warning("ElevenLabs API key not configured")
         return None
 
-    # Get voice configuration
-    voice_config = VOICE_PERSONALITIES.get(voice_personality, VOICE_PERSONALITIES["friendly"])
+    personality_id = _resolve_personality(voice_personality)
+    cache_key = _tts_cache_key(text, personality_id)
+    cached = await _tts_cached(cache_key)
+    if cached is not None:
+        return cached
     
     try:
-        headers = {
-            "xi-api-key": ELEVENLABS_API_KEY,
-            "Content-Type": "application/json",
-        }
-        body = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": voice_config["voice_settings"],
-        }
-
         resp = await http_client.post(
-            f"https://api.elevenlabs.io/v1/text-to-speech/{voice_config['voice_id']}",
-            headers=headers,
-            json=body,
-            timeout=30.0,
+            _TTS_URLS[personality_id],
+            headers=_TTS_HEADERS,
+            content=_tts_body(text, personality_id),
         )
 
         if resp.status_code != 200:
             logger.error(f"ElevenLabs error: {resp.status_code} {resp.text}")
             return None
 
+        _tts_cache_put(cache_key, resp.content)
+        await _tts_shared_put(cache_key, resp.content)
         return resp.content
 
     except Exception as exc:  # noqa: BLE001
@@ -113,6 +230,65 @@ async def get_tts_audio_data(
         return None
 
 
+async def get_tts_audio_stream(
+    text: str,
+    voice_personality: str = "friendly"
+) -> AsyncIterator[bytes]:
+    """
+    Convert text to speech using ElevenLabs and yield the MP3 audio in chunks.
+
+    Streamed audio bypasses the cache so it is never held in memory whole.
+
+    Raises:
+        RuntimeError: If the API key is missing or ElevenLabs rejects the request
+    """
+    if not ELEVENLABS_API_KEY:
+        raise RuntimeError("ElevenLabs API key not configured")
+
+    personality_id = _resolve_personality(voice_personality)
+    async with http_client.stream(
+        "POST",
+        _TTS_URLS[personality_id],
+        headers=_TTS_HEADERS,
+        content=_tts_body(text, personality_id),
+    ) as resp:
+        if resp.status_code != 200:
+            await resp.aread()
+            raise RuntimeError(f"ElevenLabs error: {resp.status_code} {resp.text}")
+        async for chunk in resp.aiter_bytes(chunk_size=64 * 1024):
+            yield chunk
+
+
+async def iter_tts(
+    text: str,
+    voice_personality: str = "friendly"
+) -> AsyncIterator[bytes]:
+    """
+    Yield MP3 audio for a streaming response, serving cached clips in a single chunk.
+
+    A fully streamed clip is added to the cache once the last chunk has been sent.
+
+    Raises:
+        RuntimeError: If the API key is missing or ElevenLabs rejects the request
+    """
+    cache_key = _tts_cache_key(text, _resolve_personality(voice_personality))
+    cached = await _tts_cached(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks: List[bytes] = []
+    async for chunk in get_tts_audio_stream(text, voice_personality):
+        chunks.append(chunk)
+        yield chunk
+    audio = b"".join(chunks)
+    _tts_cache_put(cache_key, audio)
+    await _tts_shared_put(cache_key, audio)
+
+
+_DATA_URL_PREFIX = "data:audio/mpeg;base64,"
+
+
 async def get_tts_base64(
     text: str, 
     voice_personality: str = "friendly"
@@ -132,13 +308,32 @@ async def get_tts_base64(
         return None
     
     try:
-        base64_audio = base64.b64encode(audio_data).decode('utf-8')
-        return f"data:audio/mpeg;base64,{base64_audio}"
+        # Encode off the event loop; multi-MB clips would otherwise stall other requests
+        # b64encode_as_string builds the str directly, skipping a bytes -> str decode copy
+        base64_audio = await asyncio.to_thread(pybase64.b64encode_as_string, audio_data)
+        return _DATA_URL_PREFIX + base64_audio
     except Exception as exc:  # noqa: BLE001
         logger.error(f"Failed to encode audio to base64: {exc}")
         return None
 
 
+def _exclusive_opener(path: str, flags: int) -> int:
+    """
+    Create a new owner-only file, failing rather than reusing an existing path.
+    """
+    return os.open(path, flags | os.O_CREAT | os.O_EXCL | getattr(os, "O_CLOEXEC", 0), 0o600)
+
+
+def _write_new_file(path: str, data: bytes) -> None:
+    fd = _exclusive_opener(path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 async def save_tts_to_file(
     text: str, 
     voice_personality: str = "friendly",
@@ -155,41 +350,41 @@ async def save_tts_to_file(
     Returns:
         Path to the saved audio file or None if failed
     """
-    audio_data = await get_tts_audio_data(text, voice_personality)
-    if audio_data is None:
+    if not ELEVENLABS_API_KEY:
+        logger.warning("ElevenLabs API key not configured")
         return None
-    
+
+    cached = await _tts_cached(_tts_cache_key(text, _resolve_personality(voice_personality)))
+
+    path = os.path.join(tempfile.gettempdir(), f"{filename or 'tts'}_{uuid.uuid4().hex}.mp3")
     try:
-        # Create temporary file
-        if filename:
-            temp_file = tempfile.NamedTemporaryFile(
-                delete=False, 
-                suffix=".mp3", 
-                prefix=f"{filename}_"
-            )
-        else:
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        
-        temp_file.write(audio_data)
-        temp_file.close()
-        
-        return temp_file.name
+        if cached is not None:
+            await asyncio.to_thread(_write_new_file, path, cached)
+            return path
+
+        # Write network chunks as they arrive instead of buffering the whole MP3
+        async with aiofiles.open(path, "wb", opener=_exclusive_opener) as f:
+            async for chunk in get_tts_audio_stream(text, voice_personality):
+                await f.write(chunk)
+        return path
     except Exception as exc:  # noqa: BLE001
         logger.error(f"Failed to save audio to file: {exc}")
+        with contextlib.suppress(OSError):
+            os.unlink(path)
         return None
 
 
-def get_voice_personalities() -> Dict[str, Any]:
+def get_voice_personalities() -> Mapping[str, Mapping[str, Any]]:
     """
     Get all available voice personalities with their configurations.
     
     Returns:
-        Dictionary containing all voice personality configurations
+        Read-only mapping of all voice personality configurations
     """
     return VOICE_PERSONALITIES
 
 
-def get_voice_personality(personality_id: str) -> Optional[Dict[str, Any]]:
+def get_voice_personality(personality_id: str) -> Optional[Mapping[str, Any]]:
     """
     Get a specific voice personality configuration by ID.
     
@@ -202,25 +397,17 @@ def get_voice_personality(personality_id: str) -> Optional[Dict[str, Any]]:
     return VOICE_PERSONALITIES.get(personality_id)
 
 
-def get_avatar_configurations() -> List[Dict[str, Any]]:
+def get_avatar_configurations() -> Tuple[Mapping[str, Any], ...]:
     """
     Get all avatar configurations for available voice personalities.
     
     Returns:
-        List of avatar configurations with voice personality mappings
-    """
-    avatars = []
-    for personality_id, config in VOICE_PERSONALITIES.items():
-        avatar_config = {
-            "personality_id": personality_id,
-            "voice_id": config["voice_id"],
-            "avatar": config["avatar"]
-        }
-        avatars.append(avatar_config)
-    return avatars
+        Read-only avatar configurations with voice personality mappings
+    """
+    return _AVATAR_LIST
 
 
-def get_avatar_configuration(personality_id: str) -> Optional[Dict[str, Any]]:
+def get_avatar_configuration(personality_id: str) -> Optional[Mapping[str, Any]]:
     """
     Get avatar configuration for a specific voice personality.
     
@@ -230,14 +417,7 @@ def get_avatar_configuration(personality_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Avatar configuration or None if not found
     """
-    config = VOICE_PERSONALITIES.get(personality_id)
-    if config:
-        return {
-            "personality_id": personality_id,
-            "voice_id": config["voice_id"],
-            "avatar": config["avatar"]
-        }
-    return None
+    return _AVATARS_BY_ID.get(personality_id)
 
 
 # Legacy function for backward compatibility
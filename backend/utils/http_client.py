@@ -1,4 +1,9 @@
 import httpx
 
-# Shared async HTTP client
-http_client = httpx.AsyncClient()
+# Shared async HTTP client; HTTP/2 multiplexes concurrent OpenRouter/ElevenLabs calls
+# over a few long-lived TLS connections
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60),
+    timeout=httpx.Timeout(connect=5.0, read=45.0, write=10.0, pool=5.0),
+)
@@ -0,0 +1,9 @@
+from prometheus_client import Histogram
+
+# Latency of each Supabase query by service method, exported on /metrics (P50/P95/P99 via histogram_quantile)
+SUPABASE_QUERY_SECONDS = Histogram(
+    "supabase_query_seconds",
+    "Supabase query latency in seconds",
+    ["action"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
@@ -1,19 +1,111 @@
-import json
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 from fastapi import HTTPException
 from loguru import logger
 
 from schemas import ItemDecision
 from utils.http_client import http_client
-from utils.settings import OPENROUTER_API_KEY, OPENROUTER_MODEL
+from utils.redis_client import redis_client
+from utils.settings import (
+    OPENROUTER_API_KEY,
+    OPENROUTER_MODEL,
+    REASONING_CACHE_MAX_ENTRIES,
+    REASONING_CACHE_TTL_SECONDS,
+)
 
 SYSTEM_PROMPT = (
     "You are a zero-shot waste sorting expert. "
     "For each item, decide if it goes to recycling, compost, or trash. "
-    "Respect local policy overrides when provided. Return concise explanations and an eco-tip."
+    "Respect local policy overrides when provided. Return concise explanations and an eco-tip. "
+    "Input is a JSON object with zip, policies and items. "
+    "Respond as JSON list with objects: {label, bin, explanation, eco_tip}. Only these keys."
 )
 
+if OPENROUTER_API_KEY:
+    logger.info("OpenRouter configured (model={})", OPENROUTER_MODEL)
+
+_OR_URL = "https://openrouter.ai/api/v1/chat/completions"
+_OR_HEADERS: Dict[str, str] = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "HTTP-Referer": "https://rebin.local",
+    "X-Title": "ReBin Pro",
+    "Content-Type": "application/json",
+}
+
+
+# One in-flight OpenRouter call per cache key; concurrent callers await the same task
+_INFLIGHT: Dict[bytes, "asyncio.Task[Tuple[ItemDecision, ...]]"] = {}
+
+_DECISION_DEFAULTS: Dict[str, str] = {"label": "", "bin": "", "explanation": "", "eco_tip": ""}
+
+# Parsed decisions keyed by a digest of the raw LLM reply (FIFO, bounded)
+_PARSED_CACHE: Dict[bytes, Tuple[ItemDecision, ...]] = {}
+_PARSED_CACHE_MAX_ENTRIES = 1024
+
+# Parsed decisions keyed by a digest of (items, zip, policies, model), with expiry times
+_DECISION_CACHE: "OrderedDict[bytes, Tuple[float, Tuple[ItemDecision, ...]]]" = OrderedDict()
+
+
+def _decision_cache_key(
+    items: List[str],
+    zip_code: Optional[str],
+    local_policies: Optional[Dict[str, Any]],
+) -> bytes:
+    payload = orjson.dumps(
+        {"z": zip_code, "p": local_policies or {}, "i": sorted(items), "m": OPENROUTER_MODEL},
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+    )
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+async def _cached_decisions(key: bytes) -> Optional[Tuple[ItemDecision, ...]]:
+    """
+    Look up decisions in the in-process cache, falling back to Redis.
+    """
+    entry = _DECISION_CACHE.get(key)
+    if entry is not None:
+        expires_at, decisions = entry
+        if expires_at > time.monotonic():
+            _DECISION_CACHE.move_to_end(key)
+            return decisions
+        del _DECISION_CACHE[key]
+
+    if redis_client is None:
+        return None
+    try:
+        raw = await redis_client.get(b"reason:" + key)
+    except Exception as e:
+        logger.warning(f"Reasoning shared cache read failed: {e}")
+        return None
+    if raw is None:
+        return None
+    decisions = tuple(ItemDecision(**obj) for obj in orjson.loads(raw))
+    _remember_decisions(key, decisions)
+    return decisions
+
+
+def _remember_decisions(key: bytes, decisions: Tuple[ItemDecision, ...]) -> None:
+    _DECISION_CACHE[key] = (time.monotonic() + REASONING_CACHE_TTL_SECONDS, decisions)
+    _DECISION_CACHE.move_to_end(key)
+    while len(_DECISION_CACHE) > REASONING_CACHE_MAX_ENTRIES:
+        _DECISION_CACHE.popitem(last=False)
+
+
+async def _store_decisions(key: bytes, decisions: Tuple[ItemDecision, ...]) -> None:
+    _remember_decisions(key, decisions)
+    if redis_client is None:
+        return
+    try:
+        raw = orjson.dumps([d.model_dump() for d in decisions])
+        await redis_client.setex(b"reason:" + key, REASONING_CACHE_TTL_SECONDS, raw)
+    except Exception as e:
+        logger.warning(f"Reasoning shared cache write failed: {e}")
+
 
 async def get_reasoned_decisions(
     items: List[str],
@@ -22,33 +114,66 @@ async def get_reasoned_decisions(
 ) -> List[ItemDecision]:
     """
     Calls OpenRouter for structured decisions, with optional local policy context.
+
+    Identical requests (same items in any order, ZIP, policies and model) are
+    served from cache for REASONING_CACHE_TTL_SECONDS.
+    """
+    key = _decision_cache_key(items, zip_code, local_policies)
+    cached = await _cached_decisions(key)
+    if cached is not None:
+        return list(cached)
+
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_resolve_decisions(key, items, zip_code, local_policies))
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    # Shield so one caller disconnecting does not cancel the call for the others
+    return list(await asyncio.shield(task))
+
+
+async def _resolve_decisions(
+    key: bytes,
+    items: List[str],
+    zip_code: Optional[str],
+    local_policies: Optional[Dict[str, Any]],
+) -> Tuple[ItemDecision, ...]:
+    results = await _request_decisions(items, zip_code, local_policies)
+    if not results:
+        logger.warning("No valid decisions parsed from OpenRouter response")
+        # Return a fallback decision (not cached, so the next call retries)
+        return (
+            ItemDecision(
+                label="unknown",
+                bin="trash",
+                explanation="Unable to determine proper disposal method",
+                eco_tip="Please check local recycling guidelines"
+            ),
+        )
+
+    decisions = tuple(results)
+    await _store_decisions(key, decisions)
+    return decisions
+
+
+async def _request_decisions(
+    items: List[str],
+    zip_code: Optional[str],
+    local_policies: Optional[Dict[str, Any]],
+) -> List[ItemDecision]:
+    """
+    Performs the OpenRouter call and parses its decisions; may return an empty list.
     """
     if not OPENROUTER_API_KEY:
         logger.error("OPENROUTER_API_KEY is empty or missing")
         raise HTTPException(status_code=500, detail={"error": "config", "message": "OPENROUTER_API_KEY missing"})
-    
-    logger.info(f"Using OpenRouter API key: {OPENROUTER_API_KEY[:10]}...")
-
-    user_context = {
-        "zip": zip_code,
-        "policies": local_policies or {},
-        "items": items,
-    }
 
-    prompt = (
-        f"{SYSTEM_PROMPT}\n"
-        f"ZIP: {zip_code}\n"
-        f"Local Policies JSON: {json.dumps(local_policies or {})}\n"
-        f"Items: {', '.join(items)}\n"
-        "Respond as JSON list with objects: {label, bin, explanation, eco_tip}. Only these keys."
-    )
+    # Compact JSON carries the same context in fewer tokens than a prose template
+    prompt = orjson.dumps(
+        {"zip": zip_code, "policies": local_policies or {}, "items": items},
+        option=orjson.OPT_NON_STR_KEYS,
+    ).decode()
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "https://rebin.local",
-        "X-Title": "ReBin Pro",
-        "Content-Type": "application/json",
-    }
     body = {
         "model": OPENROUTER_MODEL,
         "messages": [
@@ -58,9 +183,9 @@ async def get_reasoned_decisions(
         "response_format": {"type": "json_object"},
     }
 
-    logger.info("Requesting OpenRouter reasoning")
+    logger.debug("Requesting OpenRouter reasoning")
     try:
-        resp = await http_client.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=body, timeout=40.0)
+        resp = await http_client.post(_OR_URL, headers=_OR_HEADERS, content=orjson.dumps(body))
     except Exception as e:
         logger.error(f"OpenRouter request failed: {e}")
         raise HTTPException(status_code=503, detail={"error": "reasoning_error", "message": "Reasoning service unavailable"})
@@ -79,7 +204,7 @@ async def get_reasoned_decisions(
         raise HTTPException(status_code=502, detail={"error": "reasoning_error", "message": "Reasoning API failed"})
 
     try:
-        data = resp.json()
+        data = orjson.loads(resp.content)
     except Exception as e:
         logger.error(f"Invalid JSON response from OpenRouter: {e}")
         raise HTTPException(status_code=502, detail={"error": "reasoning_error", "message": "Invalid response from reasoning service"})
@@ -90,7 +215,12 @@ async def get_reasoned_decisions(
             raise HTTPException(status_code=502, detail={"error": "reasoning_error", "message": "Invalid response structure from reasoning service"})
         
         content = data["choices"][0]["message"]["content"]
-        parsed = json.loads(content)
+        content_key = hashlib.blake2b(content.encode(), digest_size=16).digest()
+        reparsed = _PARSED_CACHE.get(content_key)
+        if reparsed is not None:
+            return list(reparsed)
+
+        parsed = orjson.loads(content)
         
         if not isinstance(parsed, list):
             logger.error(f"Expected list from OpenRouter, got: {type(parsed)}")
@@ -98,39 +228,24 @@ async def get_reasoned_decisions(
         
         results: List[ItemDecision] = []
         for i, obj in enumerate(parsed):
-            try:
-                if not isinstance(obj, dict):
-                    logger.warning(f"Skipping invalid decision object at index {i}: {obj}")
-                    continue
-                    
-                results.append(
-                    ItemDecision(
-                        label=str(obj.get("label", "")),
-                        bin=str(obj.get("bin", "")),
-                        explanation=str(obj.get("explanation", "")),
-                        eco_tip=str(obj.get("eco_tip", "")),
-                    )
-                )
-            except Exception as e:
-                logger.warning(f"Skipping invalid decision object at index {i}: {obj}, error: {e}")
+            if not isinstance(obj, dict):
+                logger.warning(f"Skipping invalid decision object at index {i}: {obj}")
                 continue
+            fields = {**_DECISION_DEFAULTS, **obj}
+            # model_construct skips validation, so coerce the rare non-string value here
+            if not all(type(fields[key]) is str for key in _DECISION_DEFAULTS):
+                fields = {key: str(fields[key]) for key in _DECISION_DEFAULTS}
+            results.append(ItemDecision.model_construct(**fields))
         
-        if not results:
-            logger.warning("No valid decisions parsed from OpenRouter response")
-            # Return a fallback decision
-            results = [
-                ItemDecision(
-                    label="unknown",
-                    bin="trash",
-                    explanation="Unable to determine proper disposal method",
-                    eco_tip="Please check local recycling guidelines"
-                )
-            ]
-        
+        if results:
+            if len(_PARSED_CACHE) >= _PARSED_CACHE_MAX_ENTRIES:
+                del _PARSED_CACHE[next(iter(_PARSED_CACHE))]
+            _PARSED_CACHE[content_key] = tuple(results)
+
         logger.info(f"Successfully parsed {len(results)} decisions from OpenRouter")
         return results
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON from OpenRouter response: {e}")
         raise HTTPException(status_code=502, detail={"error": "parse_error", "message": "Invalid JSON response from reasoning service"})
     except Exception as exc:  # noqa: BLE001
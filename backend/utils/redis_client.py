@@ -0,0 +1,10 @@
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from utils.settings import REDIS_MAX_CONNECTIONS, REDIS_URL
+
+# Shared async Redis client; None when REDIS_URL is unset (single-process deploys)
+redis_client: Optional[Redis] = (
+    Redis.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS) if REDIS_URL else None
+)
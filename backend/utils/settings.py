@@ -1,9 +1,10 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from loguru import logger
 
-# Load .env file
-load_dotenv()
+# Load backend/.env explicitly instead of letting dotenv search the tree
+load_dotenv(Path(__file__).resolve().parent.parent / ".env", override=False)
 
 # Application configuration
 FRONTEND_ORIGIN = "http://localhost:5173"
@@ -13,11 +14,25 @@ OPENROUTER_MODEL = os.environ.get("OPENROUTER_MODEL", "openai/gpt-4o-mini")
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_ANON_KEY = os.environ.get("SUPABASE_ANON_KEY", "")
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
+# Direct Postgres DSN (session-mode pooler or direct host) for hot-path writes; optional
+SUPABASE_DB_URL = os.environ.get("SUPABASE_DB_URL", "")
 ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY", "")
 
-# Debug logging
-print(f"Looking for .env at: {Path('.env').absolute()}")
-print(f".env file exists: {Path('.env').exists()}")
-print(f"OPENROUTER_API_KEY loaded: {bool(OPENROUTER_API_KEY)}")
-if OPENROUTER_API_KEY:
-    print(f"API key starts with: {OPENROUTER_API_KEY[:10]}...")
+# Bearer token Prometheus must present to scrape /metrics; leave unset to disable the endpoint
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# In-process cache for synthesized TTS audio (bytes); 0 disables it
+TTS_CACHE_BYTES = int(os.environ.get("REBIN_TTS_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Optional shared cache across workers; leave REDIS_URL unset to disable
+REDIS_URL = os.environ.get("REDIS_URL", "")
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+TTS_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Exact-match cache for OpenRouter bin decisions
+REASONING_CACHE_MAX_ENTRIES = int(os.environ.get("REBIN_REASONING_CACHE_ENTRIES", "10000"))
+REASONING_CACHE_TTL_SECONDS = int(os.environ.get("REBIN_REASONING_CACHE_TTL", "3600"))
+
+logger.debug(
+    "Settings loaded; openrouter={} elevenlabs={}", bool(OPENROUTER_API_KEY), bool(ELEVENLABS_API_KEY)
+)
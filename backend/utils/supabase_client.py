@@ -1,33 +1,228 @@
 from typing import Any, Dict, List, Optional, Union
 from datetime import datetime, timedelta
-import json
+import asyncio
+import base64
+import functools
+import time
 
+import asyncpg
+import httpx
+import orjson
+from cachetools import TTLCache
+from fastapi import HTTPException
 from loguru import logger
+from postgrest.types import ReturnMethod
+from postgrest.utils import SyncClient
 from supabase import create_client
 
 from schemas import EventCreateRequest
-from utils.settings import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+from utils.metrics import SUPABASE_QUERY_SECONDS
+from utils.redis_client import redis_client
+from utils.settings import SUPABASE_DB_URL, SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
 
-_supabase = None
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
 
 
+@functools.lru_cache(maxsize=1)
 def supabase():
     """
     Lazy initialize Supabase client.
     """
-    global _supabase
-    if _supabase is None:
-        if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-            raise RuntimeError("Supabase configuration missing")
-        _supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-    return _supabase
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        raise RuntimeError("Supabase configuration missing")
+    client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    _tune_postgrest_session(client.postgrest)
+    return client
+
+
+class _OrjsonSession(SyncClient):
+    """
+    PostgREST session that encodes JSON request bodies with orjson instead of the stdlib encoder.
+    """
+
+    def request(self, method, url, *, json=None, **kwargs):
+        if json is not None:
+            kwargs["content"] = orjson.dumps(json, option=orjson.OPT_NON_STR_KEYS)
+            kwargs["headers"] = httpx.Headers(kwargs.get("headers"))
+            kwargs["headers"]["Content-Type"] = "application/json"
+        return super().request(method, url, **kwargs)
+
+
+def _tune_postgrest_session(postgrest) -> None:
+    """
+    Replace PostgREST's default HTTP session with one using explicit keep-alive pool limits.
+
+    supabase-py 2.6 has no option for passing in an httpx client, so the session is swapped after creation.
+    """
+    default_session = postgrest.session
+    postgrest.session = _OrjsonSession(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0),
+        follow_redirects=True,
+        http2=True,
+    )
+    default_session.close()
+
+
+async def _get_pool() -> Optional[asyncpg.Pool]:
+    """
+    Lazy initialize the direct Postgres pool; None when SUPABASE_DB_URL is unset.
+    """
+    global _pool
+    if not SUPABASE_DB_URL:
+        return None
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    dsn=SUPABASE_DB_URL,
+                    min_size=2,
+                    max_size=20,
+                    statement_cache_size=1024,
+                    init=_init_connection,
+                )
+    return _pool
+
+
+async def _init_connection(con: asyncpg.Connection) -> None:
+    # Encode and decode jsonb with orjson so callers pass plain Python values
+    await con.set_type_codec(
+        "jsonb",
+        encoder=lambda value: orjson.dumps(value).decode(),
+        decoder=orjson.loads,
+        schema="pg_catalog",
+    )
+
+
+async def close_pool() -> None:
+    """
+    Close the direct Postgres pool if it was opened.
+    """
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# Leaderboard pages and per-user ranks are cached in Redis, one key per entry
+# (leaderboard:{limit}, rank:{user_id}) so each expires on its own. They are read from
+# leaderboard_mv, which pg_cron refreshes every minute, so the TTL matches that interval;
+# invalidating on insert would only re-cache the pre-refresh rows.
+_LEADERBOARD_CACHE_TTL = 60
+
+
+async def _shared_cache_get(family: str, key: str) -> Optional[Any]:
+    """
+    Read a JSON value from Redis; None when Redis is unset, failing or missing the key.
+    """
+    if redis_client is None:
+        return None
+    try:
+        raw = await redis_client.get(f"{family}:{key}")
+    except Exception as e:
+        logger.warning(f"Redis read of {family}:{key} failed: {e}")
+        return None
+    return orjson.loads(raw) if raw is not None else None
+
+
+async def _shared_cache_set(family: str, key: str, value: Any) -> None:
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(f"{family}:{key}", orjson.dumps(value), ex=_LEADERBOARD_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Redis write of {family}:{key} failed: {e}")
+
+
+def _ttl_cached(cache_attr: str, family: str):
+    """
+    Cache a service coroutine's results in the named TTLCache, keyed by its arguments.
+
+    Empty results are not cached, since the service methods also return them on errors.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args):
+            cache = getattr(self, cache_attr)
+            key = (family, *args)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            result = await func(self, *args)
+            if result:
+                cache[key] = result
+            return result
+        return wrapper
+    return decorator
+
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just past row, ordered by (created_at, id)"""
+    return base64.urlsafe_b64encode(orjson.dumps([row["created_at"], row["id"]])).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    """Inverse of _encode_cursor; raises ValueError on a malformed cursor"""
+    try:
+        created_at, row_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return str(created_at), int(row_id)
 
 
 class SupabaseService:
     """Enhanced Supabase service with comprehensive database operations"""
+
+    # Sort event inserts are flushed as one multi-row insert per batch
+    MAX_BATCH = 200
+    MAX_WAIT_MS = 20
+
+    # Read-mostly lookups shared by every instance
+    _policy_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+    _challenge_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
     
     def __init__(self):
         self.client = supabase()
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._event_flusher: Optional[asyncio.Task] = None
+
+    async def _execute(self, builder, action: str = "query"):
+        """Run a supabase-py query builder in a worker thread so the event loop keeps serving requests"""
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(builder.execute)
+        finally:
+            SUPABASE_QUERY_SECONDS.labels(action).observe(time.perf_counter() - start)
+
+    async def _one(self, builder, action: str, context: str = "", reraise: bool = False) -> Optional[Dict[str, Any]]:
+        """Run a query and return its first row; failures are logged and give None unless reraise is set"""
+        try:
+            result = await self._execute(builder, action)
+        except Exception as e:
+            logger.error(f"Supabase {action}({context}) failed: {e}")
+            if reraise:
+                raise
+            return None
+        return result.data[0] if result.data else None
+
+    async def _many(self, builder, action: str, context: str = "") -> List[Dict[str, Any]]:
+        """Run a query and return all rows; failures are logged and give an empty list"""
+        try:
+            result = await self._execute(builder, action)
+        except Exception as e:
+            logger.error(f"Supabase {action}({context}) failed: {e}")
+            return []
+        return result.data or []
+
+    async def close(self) -> None:
+        """Stop the sort event flusher"""
+        if self._event_flusher is not None:
+            self._event_flusher.cancel()
+            self._event_flusher = None
+            self._event_queue = None
     
     # =============================================
     # USER MANAGEMENT
@@ -35,37 +230,24 @@ class SupabaseService:
     
     async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new user"""
-        try:
-            result = self.client.table('users').insert(user_data).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to create user: {e}")
-            raise
+        return await self._one(self.client.table('users').insert(user_data), "create_user", reraise=True)
     
     async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
-        try:
-            result = self.client.table('users').select('*').eq('id', user_id).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to get user {user_id}: {e}")
-            return None
+        return await self._one(self.client.table('users').select('*').eq('id', user_id), "get_user", user_id)
+    
+    async def get_users(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get several users by ID in one query"""
+        return await self._many(self.client.table('users').select('*').in_('id', user_ids), "get_users")
     
     async def update_user(self, user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Update user information"""
-        try:
-            result = self.client.table('users').update(updates).eq('id', user_id).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to update user {user_id}: {e}")
-            raise
+        return await self._one(self.client.table('users').update(updates).eq('id', user_id), "update_user", user_id, reraise=True)
     
     async def update_user_last_seen(self, user_id: str):
         """Update user's last seen timestamp"""
-        try:
-            self.client.table('users').update({'last_seen': datetime.utcnow().isoformat()}).eq('id', user_id).execute()
-        except Exception as e:
-            logger.warning(f"Failed to update last seen for user {user_id}: {e}")
+        # The database stamps now() itself, so app-node clocks never disagree
+        await self._one(self.client.rpc('touch_last_seen', {'p_user_id': user_id}), "touch_last_seen", user_id)
     
     # =============================================
     # USER PREFERENCES
@@ -73,66 +255,138 @@ class SupabaseService:
     
     async def get_user_preferences(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user preferences"""
-        try:
-            result = self.client.table('user_preferences').select('*').eq('user_id', user_id).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to get preferences for user {user_id}: {e}")
-            return None
+        return await self._one(self.client.table('user_preferences').select('*').eq('user_id', user_id), "get_user_preferences", user_id)
     
     async def update_user_preferences(self, user_id: str, preferences: Dict[str, Any]) -> Dict[str, Any]:
         """Update user preferences"""
-        try:
-            preferences['user_id'] = user_id
-            result = self.client.table('user_preferences').upsert(preferences, on_conflict='user_id').execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to update preferences for user {user_id}: {e}")
-            raise
+        preferences['user_id'] = user_id
+        return await self._one(
+            self.client.table('user_preferences').upsert(preferences, on_conflict='user_id'),
+            "update_user_preferences", user_id, reraise=True,
+        )
     
     # =============================================
     # SORT EVENTS
     # =============================================
     
     async def insert_sort_event(self, payload: EventCreateRequest) -> int:
-        """Insert a sort event row"""
+        """Queue a sort event row for the next batched insert and return its id"""
+        row = {
+            "user_id": payload.user_id,
+            "zip": payload.zip,
+            "items_json": payload.items_json,
+            "decision": payload.decision,
+            "co2e_saved": payload.co2e_saved,
+        }
+        loop = asyncio.get_running_loop()
+        if self._event_flusher is None or self._event_flusher.get_loop() is not loop:
+            self._event_queue = asyncio.Queue()
+            self._event_flusher = loop.create_task(self._flush_sort_events(self._event_queue))
+        future = loop.create_future()
+        self._event_queue.put_nowait((row, future))
+        return await future
+
+    async def _flush_sort_events(self, queue: asyncio.Queue) -> None:
+        """Drain queued sort events in batches of up to MAX_BATCH rows or MAX_WAIT_MS"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.MAX_WAIT_MS / 1000
+            while len(batch) < self.MAX_BATCH:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._write_sort_events(batch)
+
+    async def _write_sort_events(self, batch: List[Any]) -> None:
+        rows = [row for row, _ in batch]
         try:
-            row = {
-                "user_id": payload.user_id,
-                "zip": payload.zip,
-                "items_json": payload.items_json,
-                "decision": payload.decision,
-                "co2e_saved": payload.co2e_saved,
-            }
-            result = self.client.table("sort_events").insert(row).execute()
-            inserted = result.data[0]
-            
-            # Check and award achievements
-            if payload.user_id:
-                await self.check_user_achievements(payload.user_id)
-            
-            return int(inserted["id"])
+            result = await self._execute(self.client.table("sort_events").insert(rows), "insert_sort_events")
         except Exception as e:
+            if len(batch) > 1:
+                # The multi-row insert is all-or-nothing; retry row by row so one bad
+                # row only fails its own request
+                logger.warning(f"Batch insert of {len(rows)} sort events failed, retrying individually: {e}")
+                await asyncio.gather(*(self._write_sort_events([item]) for item in batch))
+                return
             logger.error(f"Failed to insert sort event: {e}")
-            raise
-    
-    async def get_user_sort_events(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """Get user's sort events"""
-        try:
-            result = self.client.table('sort_events').select('*').eq('user_id', user_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get sort events for user {user_id}: {e}")
-            return []
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        inserted_rows = result.data or []
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i < len(inserted_rows):
+                future.set_result(int(inserted_rows[i]["id"]))
+            else:
+                future.set_exception(RuntimeError("Sort event insert returned no row"))
+        # Achievements are awarded by the sort_events insert trigger
+    
+    async def get_user_sort_events(
+        self, user_id: str, limit: int = 50, cursor: Optional[str] = None, full: bool = False, offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Get a page of user's sort events, newest first, plus the cursor for the next page (None on the last).
+
+        Keyset pagination on (created_at, id) keeps deep pages as cheap as the first;
+        items_json is only included when full is set. offset is a deprecated fallback for
+        callers that have not moved to cursors yet and is ignored when a cursor is given.
+        """
+        columns = 'id, zip, items_json, decision, co2e_saved, created_at' if full else 'id, zip, decision, co2e_saved, created_at'
+        query = self.client.table('sort_events').select(columns).eq('user_id', user_id)
+        if cursor:
+            created_at, row_id = _decode_cursor(cursor)
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+        query = query.order('created_at', desc=True).order('id', desc=True)
+        query = query.range(offset, offset + limit - 1) if offset and not cursor else query.limit(limit)
+        rows = await self._many(
+            query,
+            "get_user_sort_events", user_id,
+        )
+        return {
+            'data': rows,
+            'next_cursor': _encode_cursor(rows[-1]) if len(rows) == limit else None,
+        }
+    
+    async def get_sort_events_in_range(
+        self,
+        columns: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        user_id: Optional[str] = None,
+        zip_code: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get sort events created in [start, end), optionally for one user or ZIP.
+
+        Unlike the other readers this raises on failure, so analytics report an error instead of zeros.
+        """
+        query = self.client.table('sort_events').select(columns).gte('created_at', start.isoformat())
+        if end is not None:
+            query = query.lt('created_at', end.isoformat())
+        if user_id:
+            query = query.eq('user_id', user_id)
+        if zip_code:
+            query = query.eq('zip', zip_code)
+        result = await self._execute(query, "get_sort_events_in_range")
+        return result.data or []
     
     async def get_recent_activity(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Get recent sorting activity across all users"""
-        try:
-            result = self.client.table('recent_activity').select('*').limit(limit).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get recent activity: {e}")
-            return []
+        return await self._many(
+            self.client.table('recent_activity').select('id, user_id, full_name, items_json, decision, co2e_saved, created_at').order('created_at', desc=True).limit(limit),
+            "get_recent_activity",
+        )
     
     # =============================================
     # ACHIEVEMENTS
@@ -140,21 +394,14 @@ class SupabaseService:
     
     async def get_user_achievements(self, user_id: str) -> List[Dict[str, Any]]:
         """Get user's achievements"""
-        try:
-            result = self.client.table('achievements').select('*').eq('user_id', user_id).order('earned_at', desc=True).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get achievements for user {user_id}: {e}")
-            return []
+        return await self._many(
+            self.client.table('achievements').select('*').eq('user_id', user_id).order('earned_at', desc=True),
+            "get_user_achievements", user_id,
+        )
     
     async def check_user_achievements(self, user_id: str):
         """Check and award achievements for a user"""
-        try:
-            # Call the database function to check achievements
-            result = self.client.rpc('check_achievements', {'user_uuid': user_id}).execute()
-            logger.info(f"Checked achievements for user {user_id}")
-        except Exception as e:
-            logger.warning(f"Failed to check achievements for user {user_id}: {e}")
+        await self._one(self.client.rpc('check_achievements', {'user_uuid': user_id}), "check_achievements", user_id)
     
     # =============================================
     # LEADERBOARD
@@ -162,64 +409,68 @@ class SupabaseService:
     
     async def get_leaderboard(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get leaderboard data"""
-        try:
-            result = self.client.table('leaderboard').select('*').order('total_points', desc=True).limit(limit).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get leaderboard: {e}")
-            return []
+        cached = await _shared_cache_get("leaderboard", str(limit))
+        if cached is not None:
+            return cached
+        rows = await self._many(
+            self.client.table('leaderboard_mv').select('user_id, total_items_sorted, total_co2_saved, total_points, streak_days, rank_position').order('total_points', desc=True).limit(limit),
+            "get_leaderboard",
+        )
+        if rows:
+            await _shared_cache_set("leaderboard", str(limit), rows)
+        return rows
     
     async def get_user_rank(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user's rank and stats"""
-        try:
-            result = self.client.table('leaderboard').select('*').eq('user_id', user_id).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to get rank for user {user_id}: {e}")
-            return None
+        cached = await _shared_cache_get("rank", user_id)
+        if cached is not None:
+            return cached
+        row = await self._one(
+            self.client.table('leaderboard_mv').select('total_items_sorted, total_co2_saved, total_points, streak_days, rank_position').eq('user_id', user_id),
+            "get_user_rank", user_id,
+        )
+        if row is not None:
+            await _shared_cache_set("rank", user_id, row)
+        return row
+    
+    async def get_user_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get user's rank stats and achievement count in a single RPC"""
+        return await self._one(self.client.rpc('get_user_stats', {'p_user_id': user_id}), "get_user_stats", user_id)
     
     # =============================================
     # CHALLENGES
     # =============================================
     
+    @_ttl_cached("_challenge_cache", "active")
     async def get_active_challenges(self) -> List[Dict[str, Any]]:
         """Get active challenges"""
-        try:
-            result = self.client.table('challenges').select('*').eq('is_active', True).order('created_at', desc=True).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get active challenges: {e}")
-            return []
+        return await self._many(
+            self.client.table('challenges').select('*').eq('is_active', True).order('created_at', desc=True),
+            "get_active_challenges",
+        )
     
+    @_ttl_cached("_challenge_cache", "featured")
     async def get_featured_challenges(self) -> List[Dict[str, Any]]:
         """Get featured challenges"""
-        try:
-            result = self.client.table('challenges').select('*').eq('is_active', True).eq('is_featured', True).order('created_at', desc=True).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get featured challenges: {e}")
-            return []
+        return await self._many(
+            self.client.table('challenges').select('*').eq('is_active', True).eq('is_featured', True).order('created_at', desc=True),
+            "get_featured_challenges",
+        )
     
     async def join_challenge(self, user_id: str, challenge_id: int) -> bool:
         """Join a challenge"""
-        try:
-            result = self.client.table('challenge_participants').insert({
-                'user_id': user_id,
-                'challenge_id': challenge_id
-            }).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            logger.error(f"Failed to join challenge {challenge_id} for user {user_id}: {e}")
-            return False
+        row = await self._one(
+            self.client.table('challenge_participants').insert({'user_id': user_id, 'challenge_id': challenge_id}),
+            "join_challenge", f"{user_id}, {challenge_id}",
+        )
+        return row is not None
     
     async def get_user_challenges(self, user_id: str) -> List[Dict[str, Any]]:
         """Get challenges user is participating in"""
-        try:
-            result = self.client.table('challenge_participants').select('*, challenges(*)').eq('user_id', user_id).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get challenges for user {user_id}: {e}")
-            return []
+        return await self._many(
+            self.client.table('challenge_participants').select('*, challenges(*)').eq('user_id', user_id),
+            "get_user_challenges", user_id,
+        )
     
     # =============================================
     # ANALYTICS
@@ -227,37 +478,29 @@ class SupabaseService:
     
     async def track_event(self, user_id: Optional[str], event_type: str, event_data: Dict[str, Any], session_id: Optional[str] = None):
         """Track an analytics event"""
-        try:
-            event = {
-                'user_id': user_id,
-                'session_id': session_id,
-                'event_type': event_type,
-                'event_data': event_data,
-                'timestamp': datetime.utcnow().isoformat()
-            }
-            self.client.table('analytics_events').insert(event).execute()
-        except Exception as e:
-            logger.warning(f"Failed to track event {event_type}: {e}")
+        event = {
+            'user_id': user_id,
+            'session_id': session_id,
+            'event_type': event_type,
+            'event_data': event_data
+        }
+        await self._one(self.client.table('analytics_events').insert(event, returning=ReturnMethod.minimal), "track_event", event_type)
     
     async def get_user_analytics(self, user_id: str, days: int = 30) -> Dict[str, Any]:
         """Get user analytics for the last N days"""
-        try:
-            start_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
-            
-            # Get sort events
-            sort_events = self.client.table('sort_events').select('*').eq('user_id', user_id).gte('created_at', start_date).execute()
-            
-            # Get analytics events
-            analytics_events = self.client.table('analytics_events').select('*').eq('user_id', user_id).gte('timestamp', start_date).execute()
-            
-            return {
-                'sort_events': sort_events.data or [],
-                'analytics_events': analytics_events.data or [],
-                'period_days': days
-            }
-        except Exception as e:
-            logger.error(f"Failed to get analytics for user {user_id}: {e}")
-            return {'sort_events': [], 'analytics_events': [], 'period_days': days}
+        start_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        
+        # Fetch sort events and analytics events concurrently
+        sort_events, analytics_events = await asyncio.gather(
+            self._many(self.client.table('sort_events').select('*').eq('user_id', user_id).gte('created_at', start_date), "get_user_sort_events_since", user_id),
+            self._many(self.client.table('analytics_events').select('*').eq('user_id', user_id).gte('timestamp', start_date), "get_user_analytics_events", user_id),
+        )
+        
+        return {
+            'sort_events': sort_events,
+            'analytics_events': analytics_events,
+            'period_days': days
+        }
     
     # =============================================
     # FEEDBACK
@@ -265,112 +508,128 @@ class SupabaseService:
     
     async def submit_feedback(self, user_id: str, sort_event_id: Optional[int], feedback_type: str, rating: Optional[int] = None, comment: Optional[str] = None) -> bool:
         """Submit user feedback"""
-        try:
-            feedback_data = {
-                'user_id': user_id,
-                'sort_event_id': sort_event_id,
-                'feedback_type': feedback_type,
-                'rating': rating,
-                'comment': comment
-            }
-            result = self.client.table('feedback').insert(feedback_data).execute()
-            return len(result.data) > 0
-        except Exception as e:
-            logger.error(f"Failed to submit feedback: {e}")
-            return False
+        feedback_data = {
+            'user_id': user_id,
+            'sort_event_id': sort_event_id,
+            'feedback_type': feedback_type,
+            'rating': rating,
+            'comment': comment
+        }
+        row = await self._one(self.client.table('feedback').insert(feedback_data), "submit_feedback", user_id)
+        return row is not None
     
     # =============================================
     # POLICIES
     # =============================================
     
+    @_ttl_cached("_policy_cache", "policy")
     async def get_policy_by_zip(self, zip_code: str) -> Optional[Dict[str, Any]]:
         """Get recycling policy by ZIP code"""
-        try:
-            result = self.client.table('policies').select('*').eq('zip', zip_code).eq('is_active', True).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            logger.error(f"Failed to get policy for ZIP {zip_code}: {e}")
-            return None
+        return await self._one(self.client.table('policies').select('*').eq('zip', zip_code).eq('is_active', True), "get_policy_by_zip", zip_code)
     
+    @_ttl_cached("_policy_cache", "policies")
     async def get_all_policies(self) -> List[Dict[str, Any]]:
         """Get all active policies"""
-        try:
-            result = self.client.table('policies').select('*').eq('is_active', True).execute()
-            return result.data or []
-        except Exception as e:
-            logger.error(f"Failed to get policies: {e}")
-            return []
-    
-    # =============================================
-    # REAL-TIME SUBSCRIPTIONS
-    # =============================================
-    
-    def subscribe_to_leaderboard_updates(self, callback):
-        """Subscribe to leaderboard updates"""
-        try:
-            return self.client.table('leaderboard').on('UPDATE', callback).subscribe()
-        except Exception as e:
-            logger.error(f"Failed to subscribe to leaderboard updates: {e}")
-            return None
-    
-    def subscribe_to_user_events(self, user_id: str, callback):
-        """Subscribe to user's sort events"""
-        try:
-            return self.client.table('sort_events').on('INSERT', callback).eq('user_id', user_id).subscribe()
-        except Exception as e:
-            logger.error(f"Failed to subscribe to user events for {user_id}: {e}")
-            return None
-    
-    def subscribe_to_challenges(self, callback):
-        """Subscribe to challenge updates"""
-        try:
-            return self.client.table('challenges').on('*', callback).subscribe()
-        except Exception as e:
-            logger.error(f"Failed to subscribe to challenges: {e}")
-            return None
+        return await self._many(self.client.table('policies').select('*').eq('is_active', True), "get_all_policies")
 
+    @classmethod
+    def invalidate_policy(cls, zip_code: str) -> None:
+        """Drop cached policy lookups affected by a change to zip_code"""
+        cls._policy_cache.pop(("policy", zip_code), None)
+        cls._policy_cache.pop(("policies",), None)
 
-# Global service instance
-_supabase_service = None
 
+# Global service instance
+@functools.lru_cache(maxsize=1)
 def get_supabase_service() -> SupabaseService:
     """Get the global Supabase service instance"""
-    global _supabase_service
-    if _supabase_service is None:
-        _supabase_service = SupabaseService()
-    return _supabase_service
+    return SupabaseService()
 
 
-async def ensure_seed_policies() -> None:
+def provide_supabase_service() -> SupabaseService:
     """
-    Ensure two policy rows exist (NYC, SF).
+    FastAPI dependency returning the shared service, so every route uses one connection pool.
     """
     try:
-        service = get_supabase_service()
-        existing = service.client.table("policies").select("*").in_("zip", ["10001", "94103"]).execute()
-        found_zips = {row["zip"] for row in existing.data} if existing.data else set()
+        return get_supabase_service()
+    except RuntimeError as e:
+        logger.error(f"Supabase service unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Database service unavailable")
 
-        seeds: List[Dict[str, Any]] = []
-        if "10001" not in found_zips:
-            seeds.append(
-                {"zip": "10001", "rules_json": {"recycling": ["plastic #1-2", "paper"], "compost": ["food", "yard"], "trash": ["styrofoam"]}}
-            )
-        if "94103" not in found_zips:
-            seeds.append(
-                {"zip": "94103", "rules_json": {"recycling": ["glass", "paper", "metal"], "compost": ["food", "soiled paper"], "trash": ["film plastic"]}}
+
+_SEED_POLICIES: List[Dict[str, Any]] = [
+    {"zip": "10001", "rules_json": {"recycling": ["plastic #1-2", "paper"], "compost": ["food", "yard"], "trash": ["styrofoam"]}},
+    {"zip": "94103", "rules_json": {"recycling": ["glass", "paper", "metal"], "compost": ["food", "soiled paper"], "trash": ["film plastic"]}},
+]
+
+
+# One-shot guard so the seed check runs at most once per process
+_seeded = asyncio.Event()
+_seed_lock = asyncio.Lock()
+
+
+async def ensure_seed_policies() -> None:
+    """
+    Ensure two policy rows exist (NYC, SF). Runs once per process; later calls return immediately.
+    """
+    if _seeded.is_set():
+        return
+    async with _seed_lock:
+        if _seeded.is_set():
+            return
+        try:
+            await _seed_policies()
+            _seeded.set()
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Policy seed check failed: {exc}")
+
+
+async def _seed_policies() -> None:
+    pool = await _get_pool()
+    if pool is not None:
+        async with pool.acquire() as con:
+            await con.executemany(
+                "INSERT INTO policies (zip, rules_json) VALUES ($1, $2::jsonb) ON CONFLICT (zip) DO NOTHING",
+                [(seed["zip"], seed["rules_json"]) for seed in _SEED_POLICIES],
             )
-        if seeds:
-            service.client.table("policies").upsert(seeds, on_conflict="zip").execute()
-            logger.info("Seeded policies for NYC and SF")
-        else:
-            logger.info("Policies already seeded")
-    except Exception as exc:  # noqa: BLE001
-        logger.error(f"Policy seed check failed: {exc}")
+        logger.info("Ensured seed policies for NYC and SF")
+        for seed in _SEED_POLICIES:
+            SupabaseService.invalidate_policy(seed["zip"])
+        return
+
+    service = get_supabase_service()
+    # ignore_duplicates maps to ON CONFLICT DO NOTHING, matching the asyncpg path above
+    await service._execute(
+        service.client.table("policies").upsert(
+            _SEED_POLICIES, on_conflict="zip", ignore_duplicates=True, returning=ReturnMethod.minimal
+        ),
+        "seed_policies",
+    )
+    for seed in _SEED_POLICIES:
+        SupabaseService.invalidate_policy(seed["zip"])
+    logger.info("Ensured seed policies for NYC and SF")
 
 
 async def insert_sort_event(payload: EventCreateRequest) -> int:
     """
-    Insert a sort event row using the enhanced service.
+    Insert a sort event row, directly over asyncpg when SUPABASE_DB_URL is set.
     """
-    service = get_supabase_service()
-    return await service.insert_sort_event(payload)
+    pool = await _get_pool()
+    if pool is None:
+        service = get_supabase_service()
+        return await service.insert_sort_event(payload)
+
+    try:
+        row_id = await pool.fetchval(
+            "INSERT INTO sort_events (user_id, zip, items_json, decision, co2e_saved) "
+            "VALUES ($1, $2, $3::jsonb, $4, $5) RETURNING id",
+            payload.user_id,
+            payload.zip,
+            payload.items_json,
+            payload.decision,
+            payload.co2e_saved,
+        )
+        return int(row_id)
+    except Exception as e:
+        logger.error(f"Failed to insert sort event: {e}")
+        raise
@@ -11,6 +11,7 @@ from pathlib import Path
 from typing import List, Optional
 
 import asyncpg
+import sqlparse
 from loguru import logger
 from supabase import create_client
 
@@ -18,7 +19,22 @@ from supabase import create_client
 backend_dir = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_dir))
 
-from utils.settings import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+from utils.settings import SUPABASE_DB_URL, SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+
+# Concurrent builds of indexes that schema.sql also declares (same names, IF NOT EXISTS).
+# Running these first on an already-populated database means schema.sql finds them in
+# place instead of building them under a write lock; on a fresh database the tables do
+# not exist yet, so they are skipped and schema.sql builds them on the empty tables.
+HOT_PATH_INDEXES = [
+    ("sort_events", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sort_events_user_created ON sort_events(user_id, created_at DESC)"),
+    ("analytics_events", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analytics_events_user_timestamp ON analytics_events(user_id, timestamp DESC)"),
+    ("policies", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_policies_zip_active ON policies(zip) WHERE is_active"),
+]
+
+# Statements for optional extensions (pg_cron is unavailable on plain/local Postgres or
+# without superuser). Their failure is logged and skipped rather than aborting the migration;
+# without pg_cron the materialized views must be refreshed some other way.
+OPTIONAL_STATEMENT_MARKERS = ('EXTENSION IF NOT EXISTS "pg_cron"', "cron.schedule(")
 
 
 class DatabaseMigrator:
@@ -50,15 +66,20 @@ class DatabaseMigrator:
             statements = self._split_sql_statements(sql_content)
             
             for statement in statements:
-                if statement.strip():
-                    try:
-                        # Use Supabase client to execute the statement
-                        result = self.supabase.rpc('exec_sql', {'sql': statement}).execute()
-                        logger.debug(f"Executed statement successfully")
-                    except Exception as e:
-                        logger.warning(f"Statement failed (might already exist): {e}")
-                        # Continue with other statements even if one fails
+                try:
+                    # Use Supabase client to execute the statement
+                    self.supabase.rpc('exec_sql', {'sql': statement}).execute()
+                    logger.debug(f"Executed statement successfully")
+                except Exception as e:
+                    # Triggers and RLS policies are not idempotent; re-runs hit these
+                    if "already exists" in str(e):
+                        logger.debug(f"Skipping existing object: {e}")
+                        continue
+                    if any(marker in statement for marker in OPTIONAL_STATEMENT_MARKERS):
+                        logger.warning(f"Skipping optional statement: {e}\n{statement[:200]}")
                         continue
+                    logger.error(f"Statement failed: {e}\n{statement[:200]}")
+                    return False
             
             logger.success(f"Migration completed: {migration_file}")
             return True
@@ -67,23 +88,38 @@ class DatabaseMigrator:
             logger.error(f"Migration failed: {e}")
             return False
     
+    async def create_hot_path_indexes(self) -> bool:
+        """Build the hot-path indexes concurrently over a direct Postgres connection"""
+        if not SUPABASE_DB_URL:
+            # exec_sql runs inside a transaction, where CONCURRENTLY is rejected;
+            # schema.sql creates the same indexes non-concurrently instead
+            logger.info("SUPABASE_DB_URL not set; hot-path indexes will be built by schema.sql")
+            return False
+
+        conn = await asyncpg.connect(SUPABASE_DB_URL)
+        try:
+            for table, statement in HOT_PATH_INDEXES:
+                if await conn.fetchval("SELECT to_regclass($1)", f"public.{table}") is None:
+                    logger.debug(f"Table {table} not created yet; schema.sql will build its index")
+                    continue
+                # Each statement runs in its own implicit transaction, as CONCURRENTLY requires
+                await conn.execute(statement)
+                logger.debug(f"Index ready: {statement}")
+            logger.success("Hot-path indexes created")
+            return True
+        except Exception as e:
+            logger.error(f"Concurrent index build failed: {e}")
+            return False
+        finally:
+            await conn.close()
+    
     def _split_sql_statements(self, sql_content: str) -> List[str]:
         """Split SQL content into individual statements"""
-        # Remove comments and split by semicolon
-        lines = sql_content.split('\n')
-        clean_lines = []
-        
-        for line in lines:
-            # Remove single-line comments
-            if '--' in line:
-                line = line[:line.index('--')]
-            clean_lines.append(line.strip())
-        
-        # Join and split by semicolon
-        content = ' '.join(clean_lines)
-        statements = [stmt.strip() for stmt in content.split(';') if stmt.strip()]
-        
-        return statements
+        # sqlparse keeps string literals and $$-quoted function bodies intact
+        return [
+            stmt for stmt in sqlparse.split(sql_content)
+            if sqlparse.format(stmt, strip_comments=True).strip()
+        ]
     
     async def check_migration_status(self) -> dict:
         """Check which migrations have been applied"""
@@ -173,11 +209,10 @@ class DatabaseMigrator:
                 }
             ]
             
-            for policy in policies_data:
-                try:
-                    self.supabase.table('policies').upsert(policy, on_conflict='zip').execute()
-                except Exception as e:
-                    logger.warning(f"Could not insert policy for {policy['zip']}: {e}")
+            try:
+                self.supabase.table('policies').upsert(policies_data, on_conflict='zip').execute()
+            except Exception as e:
+                logger.warning(f"Could not upsert policies: {e}")
             
             # Seed default challenges
             challenges_data = [
@@ -216,11 +251,17 @@ class DatabaseMigrator:
                 }
             ]
             
-            for challenge in challenges_data:
-                try:
-                    self.supabase.table('challenges').insert(challenge).execute()
-                except Exception as e:
-                    logger.warning(f"Could not insert challenge {challenge['title']}: {e}")
+            try:
+                # titles have no unique constraint, so filter out existing ones before one bulk insert
+                existing = self.supabase.table('challenges').select('title').in_(
+                    'title', [c['title'] for c in challenges_data]
+                ).execute()
+                existing_titles = {row['title'] for row in existing.data or []}
+                new_challenges = [c for c in challenges_data if c['title'] not in existing_titles]
+                if new_challenges:
+                    self.supabase.table('challenges').insert(new_challenges).execute()
+            except Exception as e:
+                logger.warning(f"Could not insert challenges: {e}")
             
             logger.success("Initial data seeding completed")
             
@@ -237,6 +278,8 @@ class DatabaseMigrator:
             status = await self.check_migration_status()
             logger.info(f"Current migration status: {status}")
             
+            await self.create_hot_path_indexes()
+            
             # Run schema migration
             schema_success = await self.run_migration('schema.sql')
             if schema_success:
@@ -4,6 +4,7 @@
 -- Enable necessary extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+CREATE EXTENSION IF NOT EXISTS "pg_cron";
 
 -- =============================================
 -- EXISTING TABLES (Enhanced)
@@ -170,6 +171,11 @@ CREATE TABLE IF NOT EXISTS leaderboard (
     last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Large JSONB values are TOASTed and compressed; lz4 is much cheaper than the default pglz
+ALTER TABLE sort_events ALTER COLUMN items_json SET COMPRESSION lz4;
+ALTER TABLE analytics_events ALTER COLUMN event_data SET COMPRESSION lz4;
+ALTER TABLE policies ALTER COLUMN rules_json SET COMPRESSION lz4;
+
 -- =============================================
 -- INDEXES FOR PERFORMANCE
 -- =============================================
@@ -189,7 +195,9 @@ CREATE INDEX IF NOT EXISTS idx_sort_events_co2e_saved ON sort_events(co2e_saved
 CREATE INDEX IF NOT EXISTS idx_sort_events_user_created ON sort_events(user_id, created_at DESC);
 
 -- Policies table indexes
-CREATE INDEX IF NOT EXISTS idx_policies_zip ON policies(zip);
+-- zip is already covered by its UNIQUE constraint; lookups only ever want active rows
+DROP INDEX IF EXISTS idx_policies_zip;
+CREATE INDEX IF NOT EXISTS idx_policies_zip_active ON policies(zip) WHERE is_active;
 CREATE INDEX IF NOT EXISTS idx_policies_city_state ON policies(city, state);
 CREATE INDEX IF NOT EXISTS idx_policies_is_active ON policies(is_active);
 
@@ -276,38 +284,77 @@ CREATE TRIGGER update_user_last_seen_trigger
     AFTER INSERT ON sort_events 
     FOR EACH ROW EXECUTE FUNCTION update_user_last_seen();
 
--- Function to calculate and update leaderboard
+-- Function to update leaderboard totals and award milestone achievements incrementally
 CREATE OR REPLACE FUNCTION update_leaderboard()
 RETURNS TRIGGER AS $$
 DECLARE
-    user_stats RECORD;
+    event_co2 FLOAT := COALESCE(NEW.co2e_saved, 0);
+    new_items INTEGER;
+    new_co2 FLOAT;
+    unique_days BIGINT;
 BEGIN
-    -- Get user statistics
-    SELECT 
-        COUNT(*) as total_items,
-        COALESCE(SUM(co2e_saved), 0) as total_co2,
-        COALESCE(SUM(
-            CASE 
-                WHEN decision = 'recycling' THEN 10
-                WHEN decision = 'compost' THEN 8
-                WHEN decision = 'trash' THEN 2
-                ELSE 0
-            END
-        ), 0) as total_points
-    INTO user_stats
-    FROM sort_events 
-    WHERE user_id = NEW.user_id;
-    
-    -- Update or insert leaderboard entry
+    IF NEW.user_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    -- Add this event to the running totals instead of re-aggregating the user's history
     INSERT INTO leaderboard (user_id, total_items_sorted, total_co2_saved, total_points, last_updated)
-    VALUES (NEW.user_id, user_stats.total_items, user_stats.total_co2, user_stats.total_points, NOW())
-    ON CONFLICT (user_id) 
-    DO UPDATE SET 
-        total_items_sorted = user_stats.total_items,
-        total_co2_saved = user_stats.total_co2,
-        total_points = user_stats.total_points,
-        last_updated = NOW();
-    
+    VALUES (
+        NEW.user_id,
+        1,
+        event_co2,
+        CASE
+            WHEN NEW.decision = 'recycling' THEN 10
+            WHEN NEW.decision = 'compost' THEN 8
+            WHEN NEW.decision = 'trash' THEN 2
+            ELSE 0
+        END,
+        NOW()
+    )
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        total_items_sorted = leaderboard.total_items_sorted + 1,
+        total_co2_saved = leaderboard.total_co2_saved + EXCLUDED.total_co2_saved,
+        total_points = leaderboard.total_points + EXCLUDED.total_points,
+        last_updated = NOW()
+    RETURNING total_items_sorted, total_co2_saved INTO new_items, new_co2;
+
+    -- Item milestones are awarded on the insert that reaches them exactly
+    INSERT INTO achievements (user_id, achievement_type, points)
+    SELECT NEW.user_id, m.achievement_type, m.points
+    FROM (VALUES
+        (1, 'first_sort', 10),
+        (10, 'sorting_novice', 50),
+        (100, 'sorting_expert', 200)
+    ) AS m(threshold, achievement_type, points)
+    WHERE m.threshold = new_items
+    ON CONFLICT (user_id, achievement_type) DO NOTHING;
+
+    -- 1kg CO2 saved, awarded when the total crosses the boundary
+    IF new_co2 >= 1.0 AND new_co2 - event_co2 < 1.0 THEN
+        INSERT INTO achievements (user_id, achievement_type, points)
+        VALUES (NEW.user_id, 'eco_warrior', 100)
+        ON CONFLICT (user_id, achievement_type) DO NOTHING;
+    END IF;
+
+    -- 7-day streak; the distinct-day count can only grow on a user's first sort of the day
+    IF NOT EXISTS (
+        SELECT 1 FROM sort_events
+        WHERE user_id = NEW.user_id
+          AND id <> NEW.id
+          AND DATE(created_at) = DATE(NEW.created_at)
+    ) THEN
+        SELECT COUNT(DISTINCT DATE(created_at)) INTO unique_days
+        FROM sort_events
+        WHERE user_id = NEW.user_id;
+
+        IF unique_days >= 7 THEN
+            INSERT INTO achievements (user_id, achievement_type, points)
+            VALUES (NEW.user_id, 'week_warrior', 150)
+            ON CONFLICT (user_id, achievement_type) DO NOTHING;
+        END IF;
+    END IF;
+
     RETURN NEW;
 END;
 $$ language 'plpgsql';
@@ -334,7 +381,7 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
--- Function to check and award achievements
+-- Function to re-check all achievements for a user from scratch (backfills; inserts award via update_leaderboard)
 CREATE OR REPLACE FUNCTION check_achievements(user_uuid UUID)
 RETURNS void AS $$
 DECLARE
@@ -387,6 +434,12 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Function to stamp a user's last_seen with the database clock
+CREATE OR REPLACE FUNCTION touch_last_seen(p_user_id UUID)
+RETURNS void AS $$
+    UPDATE users SET last_seen = NOW() WHERE id = p_user_id;
+$$ language 'sql';
+
 -- =============================================
 -- ROW LEVEL SECURITY (RLS)
 -- =============================================
@@ -477,8 +530,16 @@ LEFT JOIN leaderboard l ON u.id = l.user_id
 LEFT JOIN achievements a ON u.id = a.user_id
 GROUP BY u.id, l.total_items_sorted, l.total_co2_saved, l.total_points, l.rank_position, l.streak_days;
 
--- Recent activity view
-CREATE OR REPLACE VIEW recent_activity AS
+-- Recent activity snapshot (materialized; replaces the former live view)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_views WHERE schemaname = 'public' AND viewname = 'recent_activity') THEN
+        DROP VIEW recent_activity;
+    END IF;
+END;
+$$;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS recent_activity AS
 SELECT 
     se.id,
     se.user_id,
@@ -492,6 +553,53 @@ JOIN users u ON se.user_id = u.id
 ORDER BY se.created_at DESC
 LIMIT 100;
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_recent_activity_id ON recent_activity(id);
+CREATE INDEX IF NOT EXISTS idx_recent_activity_created_at ON recent_activity(created_at DESC);
+
+-- Ranked leaderboard snapshot
+CREATE MATERIALIZED VIEW IF NOT EXISTS leaderboard_mv AS
+SELECT
+    user_id,
+    total_items_sorted,
+    total_co2_saved,
+    total_points,
+    streak_days,
+    ROW_NUMBER() OVER (ORDER BY total_points DESC, total_co2_saved DESC) AS rank_position,
+    last_updated
+FROM leaderboard;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_leaderboard_mv_user_id ON leaderboard_mv(user_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_mv_total_points ON leaderboard_mv(total_points DESC);
+
+-- Function returning a user's leaderboard stats and achievement count in one round trip.
+-- Reads leaderboard_mv so the rank matches the leaderboard endpoints.
+CREATE OR REPLACE FUNCTION get_user_stats(p_user_id UUID)
+RETURNS TABLE (
+    total_items_sorted INTEGER,
+    total_co2_saved FLOAT,
+    total_points INTEGER,
+    rank_position INTEGER,
+    streak_days INTEGER,
+    achievement_count BIGINT
+) AS $$
+    SELECT
+        l.total_items_sorted,
+        l.total_co2_saved,
+        l.total_points,
+        l.rank_position::INTEGER,
+        l.streak_days,
+        a.achievement_count
+    FROM leaderboard_mv l
+    CROSS JOIN (
+        SELECT COUNT(*) AS achievement_count FROM achievements WHERE user_id = p_user_id
+    ) a
+    WHERE l.user_id = p_user_id;
+$$ language 'sql' STABLE;
+
+-- Refresh both snapshots every minute; CONCURRENTLY keeps them readable during the refresh
+SELECT cron.schedule('refresh-recent-activity', '*/1 * * * *', 'REFRESH MATERIALIZED VIEW CONCURRENTLY recent_activity');
+SELECT cron.schedule('refresh-lb', '*/1 * * * *', 'REFRESH MATERIALIZED VIEW CONCURRENTLY leaderboard_mv');
+
 -- Challenge progress view
 CREATE OR REPLACE VIEW challenge_progress AS
 SELECT 
@@ -535,7 +643,11 @@ COMMENT ON TABLE user_sessions IS 'User session tracking for analytics';
 COMMENT ON TABLE analytics_events IS 'Detailed analytics and user behavior tracking';
 COMMENT ON TABLE feedback IS 'User feedback on sorting decisions';
 COMMENT ON TABLE leaderboard IS 'User rankings and statistics (materialized)';
+COMMENT ON MATERIALIZED VIEW leaderboard_mv IS 'Ranked leaderboard snapshot, refreshed every minute by pg_cron';
+COMMENT ON MATERIALIZED VIEW recent_activity IS 'Latest 100 sort events, refreshed every minute by pg_cron';
 
-COMMENT ON FUNCTION update_leaderboard() IS 'Updates leaderboard when new sort events are added';
+COMMENT ON FUNCTION update_leaderboard() IS 'Adds new sort events to leaderboard totals and awards milestone achievements';
 COMMENT ON FUNCTION check_achievements(UUID) IS 'Checks and awards achievements based on user activity';
 COMMENT ON FUNCTION update_leaderboard_rankings() IS 'Updates rank positions in leaderboard';
+COMMENT ON FUNCTION touch_last_seen(UUID) IS 'Sets users.last_seen to NOW() for one user';
+COMMENT ON FUNCTION get_user_stats(UUID) IS 'Returns leaderboard stats and achievement count for a user';
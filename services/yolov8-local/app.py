@@ -1,10 +1,32 @@
+"""
+Local YOLO object-detection service.
+
+The model is loaded once at import time. On CPU hosts, gunicorn.conf.py turns on
+--preload, so the model loads in the master before forking and workers share
+the weight pages copy-on-write:
+
+    WEB_CONCURRENCY=4 gunicorn app:app
+
+On GPU hosts, preload is off and a single worker loads the model, because CUDA
+cannot be used in a process forked after CUDA init. Kernels serialize on the
+device anyway, so the in-process micro-batcher provides the concurrency.
+
+uvloop and httptools come with uvicorn[standard]. UvicornWorker picks them up
+automatically. When running uvicorn directly, request them explicitly:
+
+    uvicorn app:app --loop uvloop --http httptools --workers 1
+"""
 from fastapi import FastAPI, File, UploadFile, HTTPException
-import logging, io
+from fastapi.responses import ORJSONResponse
+import asyncio, contextlib, logging, io, os, time, warnings
 import numpy as np
 from PIL import Image
 
 # --- PyTorch safe allow-list MUST come before any model load ---
 import torch
+import torch.nn.functional as F
+import torchvision
+from torchvision.io import ImageReadMode
 from torch.serialization import add_safe_globals, safe_globals
 from ultralytics.nn.tasks import DetectionModel           # import the class itself
 import torch.nn.modules.container as container            # Sequential lives here
@@ -17,27 +39,260 @@ from ultralytics import YOLO  # import after the allow-list so internal loads ar
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="YOLOv11 Local Service")
+# np.asarray over a PIL image is a read-only view; decoded tensors are never written in place
+warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+
+app = FastAPI(title="YOLO Local Service", default_response_class=ORJSONResponse)
+
+# One image serves any checkpoint; deploy one container per model with different env
+WEIGHTS_PATH = os.environ.get("YOLO_WEIGHTS", "yolo11l.pt")
+IMGSZ = 640
+PAD_VALUE = 114  # Ultralytics letterbox grey
+DEVICE = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+CONF_THRESHOLD = float(os.environ.get("YOLO_CONF", "0.2"))
+IOU_THRESHOLD = 0.7  # Ultralytics predict default
+MAX_DET = 300
+WARMUP_RUNS = 3
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_DECODE_SIZE = 1280  # no decoded side needs to exceed ~2x IMGSZ
+
+# Micro-batching: concurrent /predict calls are coalesced into one forward pass
+MAX_BATCH = 16
+BATCH_WINDOW_S = 0.005
+QUEUE_SIZE = 64
+
+if DEVICE.type == "cuda":
+    # Serve from a single GPU; input shape is fixed at IMGSZ so cuDNN autotuning pays off
+    torch.cuda.set_device(DEVICE)
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
+
+@contextlib.contextmanager
+def mmap_torch_load():
+    """Make torch.load memory-map checkpoints while the YOLO wrapper loads its weights.
+
+    Pages then come from the OS page cache lazily instead of being read into a
+    private buffer, so restarts on the same host skip the disk read.
+    """
+    original_load = torch.load
+
+    def load(*args, **kwargs):
+        kwargs.setdefault("mmap", True)
+        try:
+            return original_load(*args, **kwargs)
+        except RuntimeError:
+            # Legacy (non-zip) checkpoints and file objects cannot be mapped
+            kwargs.pop("mmap")
+            return original_load(*args, **kwargs)
+
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = original_load
+
+
+def load_tensorrt_engine(pt_model):
+    """Swap the PyTorch checkpoint for a TensorRT FP16 engine when a GPU is present.
+
+    The engine is cached next to the weights so only the first container start
+    pays for the export; any failure keeps serving the .pt model.
+    """
+    if not torch.cuda.is_available():
+        logger.info("CUDA not available - serving PyTorch weights")
+        return pt_model
+
+    engine_path = os.path.splitext(WEIGHTS_PATH)[0] + ".engine"
+    try:
+        if not os.path.exists(engine_path):
+            logger.info(f"Exporting {WEIGHTS_PATH} to TensorRT FP16 engine (one-time)")
+            # dynamic batch axis so the micro-batcher can submit up to MAX_BATCH images
+            engine_path = pt_model.export(
+                format="engine", half=True, imgsz=IMGSZ, device=0,
+                dynamic=True, batch=MAX_BATCH, workspace=4,
+            )
+        engine_model = YOLO(engine_path, task="detect")
+        logger.info(f"Loaded TensorRT engine from {engine_path}")
+        return engine_model
+    except Exception as e:
+        logger.warning(f"TensorRT engine unavailable, falling back to PyTorch weights: {e}")
+        return pt_model
+
+
+def decode_image(image_data: bytearray):
+    """Decode an upload buffer to a (3, H, W) uint8 tensor on DEVICE.
+
+    JPEGs are decoded on the GPU with nvJPEG so only the compressed bitstream
+    crosses PCIe; everything else (or a JPEG nvJPEG rejects) goes through PIL.
+    """
+    if DEVICE.type == "cuda" and image_data[:3] == b"\xff\xd8\xff":
+        try:
+            # Zero-copy view over the upload bytearray (writable, so torch doesn't warn)
+            buf = torch.frombuffer(image_data, dtype=torch.uint8)
+            return torchvision.io.decode_jpeg(buf, mode=ImageReadMode.RGB, device=DEVICE)
+        except RuntimeError as e:
+            logger.warning(f"nvJPEG decode failed, falling back to PIL: {e}")
+
+    image = Image.open(io.BytesIO(image_data))
+    image.draft("RGB", (MAX_DECODE_SIZE, MAX_DECODE_SIZE))  # libjpeg-turbo downscales during IDCT
+    if max(image.size) > MAX_DECODE_SIZE:
+        # PNG/WebP (and JPEG drafts, which stop at a power-of-two scale) still need a resize
+        image.thumbnail((MAX_DECODE_SIZE, MAX_DECODE_SIZE), Image.BILINEAR)
+    image_array = np.asarray(image.convert("RGB"), dtype=np.uint8)
+    if not image_array.flags.c_contiguous:
+        image_array = np.ascontiguousarray(image_array)
+    return torch.from_numpy(image_array).permute(2, 0, 1).to(DEVICE)
+
+
+def letterbox(image):
+    """Resize a (3, H, W) uint8 tensor to fit IMGSZ, pad to square and scale to [0, 1].
+
+    The result is already in the backend's input dtype (FP16 for half engines).
+    """
+    _, h, w = image.shape
+    scale = IMGSZ / max(h, w)
+    new_h, new_w = round(h * scale), round(w * scale)
+    image = F.interpolate(image[None].float(), size=(new_h, new_w), mode="bilinear", align_corners=False)
+    top, left = (IMGSZ - new_h) // 2, (IMGSZ - new_w) // 2
+    image = F.pad(image, (left, IMGSZ - new_w - left, top, IMGSZ - new_h - top), value=PAD_VALUE)
+    dtype = torch.float16 if backend.fp16 else torch.float32
+    return (image[0] / 255.0).to(dtype)
+
+
+def decode_predictions(preds):
+    """Yield (classes, scores) per image from raw (N, 4 + nc, anchors) YOLO output after NMS."""
+    if isinstance(preds, (list, tuple)):  # PyTorch backends also return intermediate features
+        preds = preds[0]
+    for pred in preds.transpose(1, 2):  # (anchors, 4 + nc), boxes as cx, cy, w, h
+        scores, classes = pred[:, 4:].max(dim=1)
+        keep = scores > CONF_THRESHOLD
+        xywh, scores, classes = pred[keep, :4].float(), scores[keep].float(), classes[keep]
+        boxes = torch.cat((xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2), dim=1)
+        keep = torchvision.ops.batched_nms(boxes, scores, classes, IOU_THRESHOLD)[:MAX_DET]
+        yield classes[keep], scores[keep]
+
+
+@torch.inference_mode()  # grad mode is thread-local, so set it where the worker thread runs
+def forward(images):
+    """Letterbox a list of decoded (3, H, W) images, stack them and run the backend and NMS.
+
+    Called from a worker thread so none of the tensor work blocks the event loop.
+    Returns one list of (class_id, confidence) pairs per image. Each image's
+    detections come back to the host in a single transfer.
+    """
+    preds = backend(torch.stack([letterbox(image) for image in images]))
+    results = []
+    for classes, scores in decode_predictions(preds):
+        rows = torch.stack((classes.float(), scores), dim=1).cpu().tolist()
+        results.append([(int(cls), conf) for cls, conf in rows])
+    return results
+
+
+backend = None
+CLASS_NAMES = []  # class id -> label, filled once the model loads
+
+
+def warmup():
+    """Run dummy batches through the hot path so cuDNN/TensorRT setup happens before traffic."""
+    dummy = [torch.zeros((3, IMGSZ, IMGSZ), dtype=torch.uint8, device=DEVICE)]
+    start = time.perf_counter()
+    for _ in range(WARMUP_RUNS):
+        forward(dummy)
+    if DEVICE.type == "cuda":
+        torch.cuda.synchronize()
+    logger.info(f"Warmup finished: {WARMUP_RUNS} runs in {time.perf_counter() - start:.2f}s")
+
 
 try:
     # wrap the load in a safe_globals context to be extra sure
-    with safe_globals([DetectionModel, container.Sequential]):
-        model = YOLO("yolo11l.pt")  # auto-downloads if not present
-    logger.info("yolo11l model loaded successfully")
+    with safe_globals([DetectionModel, container.Sequential]), mmap_torch_load():
+        model = YOLO(WEIGHTS_PATH)  # auto-downloads if not present
+    logger.info(f"{WEIGHTS_PATH} model loaded successfully")
+    model = load_tensorrt_engine(model)
+    # One throwaway predict builds the predictor's AutoBackend (fused, engine-aware),
+    # which the batch worker then calls directly. half=True casts .pt weights to FP16
+    # on GPU (engines carry their own precision); FP16 is slower on CPU, so skip it there.
+    model.predict(
+        np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8),
+        imgsz=IMGSZ, device=DEVICE, half=DEVICE.type == "cuda", verbose=False,
+    )
+    backend = model.predictor.model
+    CLASS_NAMES = [model.names[i] for i in range(len(model.names))]
+    warmup()
+    # Nothing outside forward() needs autograd either (grad mode is per thread)
+    torch.set_grad_enabled(False)
 except FileNotFoundError:
-    logger.error("yolo11l weights not found and could not be downloaded")
+    logger.error(f"{WEIGHTS_PATH} weights not found and could not be downloaded")
     model = None
 except torch.serialization.pickle.UnpicklingError as e:
     logger.error(f"Model file corrupted or incompatible: {e}")
     model = None
 except Exception as e:
-    logger.error(f"Failed to load yolo11l model: {e}")
+    logger.error(f"Failed to load {WEIGHTS_PATH} model: {e}")
     model = None
 
+# Created on startup so it is bound to the serving event loop
+request_queue = None
+batch_task = None
+
+
+async def batch_worker():
+    """Drain the request queue in batches of up to MAX_BATCH and run one forward pass each."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await request_queue.get()]
+        deadline = loop.time() + BATCH_WINDOW_S
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(request_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # forward() preprocesses itself, so YOLO.__call__ is skipped entirely
+        images = [image for image, _ in batch]
+        try:
+            results = await asyncio.to_thread(forward, images)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+@app.on_event("startup")
+async def start_batcher():
+    global request_queue, batch_task
+    app.state.model = model
+    request_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    batch_task = asyncio.create_task(batch_worker())
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if batch_task is not None:
+        batch_task.cancel()
+
+
+async def run_inference(image):
+    """Queue one decoded image for the batch worker and wait for its result."""
+    future = asyncio.get_running_loop().create_future()
+    await request_queue.put((image, future))
+    return await future
+
+
 @app.post("/predict")
 async def predict(file: UploadFile = File(...)):
     if model is None:
-        raise HTTPException(status_code=503, detail="yolo11l model not loaded - service unavailable")
+        raise HTTPException(status_code=503, detail=f"{WEIGHTS_PATH} model not loaded - service unavailable")
     
     # Validate file type
     if not file.content_type or not file.content_type.startswith('image/'):
@@ -47,37 +302,31 @@ async def predict(file: UploadFile = File(...)):
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
     try:
-        image_data = await file.read()
-        
-        if len(image_data) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Image file too large (max 10MB)")
+        # Read in chunks so an oversized upload is rejected without buffering it whole
+        image_data = bytearray()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            if len(image_data) + len(chunk) > MAX_FILE_SIZE:
+                raise HTTPException(status_code=413, detail="Image file too large (max 10MB)")
+            image_data.extend(chunk)
         
         if len(image_data) == 0:
             raise HTTPException(status_code=400, detail="Empty image file")
         
         # Try to open and process image
         try:
-            image = Image.open(io.BytesIO(image_data)).convert("RGB")
+            # Decoding is CPU/sync-bound; keep it off the event loop
+            image = await asyncio.to_thread(decode_image, image_data)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Invalid image format: {str(e)}")
         
-        image_array = np.array(image)
-        
         # Validate image dimensions
-        if image_array.shape[0] == 0 or image_array.shape[1] == 0:
+        if image.shape[1] == 0 or image.shape[2] == 0:
             raise HTTPException(status_code=400, detail="Image has invalid dimensions")
 
-        results = model(image_array, conf=0.2)
-        logger.info(f"Processed image: {image_array.shape}, found {len(results)} result(s)")
+        result = await run_inference(image)
+        logger.info(f"Processed image: {tuple(image.shape)}")
         
-        detections = []
-        for r in results:
-            if r.boxes is not None:
-                for box in r.boxes:
-                    class_id = int(box.cls[0])
-                    label = model.names[class_id]
-                    conf = float(box.conf[0])
-                    detections.append({"label": label, "confidence": conf})
+        detections = [{"label": CLASS_NAMES[class_id], "confidence": conf} for class_id, conf in result]
 
         logger.info(f"Detected {len(detections)} objects: {[d['label'] for d in detections]}")
         return {"objects": detections}
@@ -0,0 +1,20 @@
+"""Gunicorn settings for the YOLO service (picked up automatically from the working directory)."""
+import os
+
+import torch
+
+bind = "0.0.0.0:9000"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+# app.py loads the model at import: weight download, a first-boot TensorRT export
+# that can take minutes, and warmup. The timeout has to cover that worst case, but
+# stays finite so a worker wedged later (e.g. in a CUDA call) is still restarted.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "900"))
+graceful_timeout = 60
+
+# Preloading shares the weights copy-on-write across forked workers, but CUDA
+# cannot be used in a child forked after the parent touched the GPU, so GPU
+# hosts load in the (single) worker instead. is_available() does not create a
+# CUDA context, so checking it here is fork-safe.
+preload_app = not torch.cuda.is_available()